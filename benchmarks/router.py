@@ -0,0 +1,181 @@
+"""
+Router micro-benchmarks.
+
+Builds synthetic route tables mixing static, argument and wildcard routes,
+then measures ``WordRouter.add``, ``WordRouter.dispatch`` (trie, frozen
+and compact) and ``Application.dispatch`` including the annotation
+conversion. Results are written as JSON, to compare between commits.
+
+    python benchmarks/router.py --sizes 10,1000 --output router.json
+"""
+import argparse
+import gc
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from os.path import abspath, dirname
+
+sys.path.insert(0, dirname(dirname(abspath(__file__))))
+
+from gongish import Application, __version__  # noqa: E402
+from gongish.helpers import WordRouter  # noqa: E402
+
+DEFAULT_SIZES = (10, 1000, 10000, 100000)
+
+
+def make_routes(size):
+    """
+    Return ``(route, has_annotations)`` pairs, half static, a third with
+    annotated arguments and the rest wildcards.
+    """
+    routes = []
+    for i in range(size):
+        kind = i % 6
+        if kind < 3:
+            routes.append((f"/api/v{i % 3}/res{i}/list", False))
+        elif kind < 5:
+            routes.append((f"/api/v{i % 3}/res{i}/:id/items/:item", True))
+        else:
+            routes.append((f"/files/res{i}/*", False))
+
+    return routes
+
+
+def make_probe(route):
+    return (
+        route.replace(":id", "john")
+        .replace(":item", "12")
+        .replace("*", "a/b/c")
+    )
+
+
+def measure(fn, items, min_time=0.2):
+    """Call ``fn`` for every item repeatedly, return ns per call"""
+    loops = 1
+    while True:
+        start = time.perf_counter_ns()
+        for _ in range(loops):
+            for item in items:
+                fn(item)
+        elapsed = time.perf_counter_ns() - start
+        if elapsed >= min_time * 1e9:
+            return round(elapsed / (loops * len(items)), 1)
+        loops *= 2
+
+
+def measure_memory(build):
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, current, peak
+
+
+def sample(items, count=1000):
+    step = max(1, len(items) // count)
+    return items[::step][:count]
+
+
+def bench_wordrouter(routes, probes):
+    handler = lambda *a: None  # noqa: E731
+
+    def build():
+        router = WordRouter()
+        for route, _ in routes:
+            router.add(route, handler)
+        return router
+
+    start = time.perf_counter_ns()
+    router = build()
+    add_ns = round((time.perf_counter_ns() - start) / len(routes), 1)
+    _, current, peak = measure_memory(build)
+
+    result = {
+        "add_ns": add_ns,
+        "memory_current": current,
+        "memory_peak": peak,
+        "memory_report": router.memory_report(),
+        "dispatch_ns": measure(router.dispatch, probes),
+    }
+
+    router.freeze()
+    result["frozen_dispatch_ns"] = measure(router.dispatch, probes)
+
+    router = build()
+    router.compact()
+    result["compact_dispatch_ns"] = measure(router.dispatch, probes)
+    result["compact_memory_report"] = router.memory_report()
+    return result
+
+
+def bench_application(routes, probes):
+    def handler(*args):
+        pass
+
+    def annotated(name: str, item: int):
+        pass
+
+    def build():
+        app = Application()
+        for route, has_annotations in routes:
+            app.route(route, verbs=("get",))(
+                annotated if has_annotations else handler
+            )
+        return app
+
+    start = time.perf_counter_ns()
+    app = build()
+    route_ns = round((time.perf_counter_ns() - start) / len(routes), 1)
+    _, current, peak = measure_memory(build)
+
+    return {
+        "route_ns": route_ns,
+        "memory_current": current,
+        "memory_peak": peak,
+        "dispatch_ns": measure(lambda p: app.dispatch(p, "get"), probes),
+    }
+
+
+def run(sizes):
+    results = {
+        "gongish": __version__,
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "sizes": {},
+    }
+    for size in sizes:
+        routes = make_routes(size)
+        probes = sample([make_probe(r) for r, _ in routes])
+        results["sizes"][str(size)] = {
+            "wordrouter": bench_wordrouter(routes, probes),
+            "application": bench_application(routes, probes),
+        }
+        print(f"{size} routes done", file=sys.stderr)
+
+    return results
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    p.add_argument(
+        "--sizes",
+        default=",".join(str(i) for i in DEFAULT_SIZES),
+        help="Comma separated route table sizes",
+    )
+    p.add_argument("--output", help="Output JSON file (default: stdout)")
+    args = p.parse_args(argv)
+
+    results = run([int(i) for i in args.sizes.split(",")])
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,273 @@
+"""
+End-to-end in-process WSGI throughput benchmark.
+
+Every scenario calls ``Application.__call__`` with a freshly built
+environ and consumes the response, next to a bare WSGI application
+producing the same response as the baseline.
+
+    python benchmarks/wsgi.py --output wsgi.json
+    python benchmarks/wsgi.py --save-baseline benchmarks/baseline.json
+    python benchmarks/wsgi.py --baseline benchmarks/baseline.json \\
+        --max-regression 10
+
+With ``--baseline`` the run fails (exit status 1) when the req/s of any
+scenario drops more than ``--max-regression`` percent.
+"""
+import argparse
+import io
+import json
+import logging
+import platform
+import sys
+import time
+from os.path import abspath, dirname, join
+from wsgiref.util import setup_testing_defaults
+
+sys.path.insert(0, dirname(dirname(abspath(__file__))))
+
+from gongish import Application, HTTPNotFound, __version__  # noqa: E402
+
+STUFF_DIR = join(dirname(dirname(abspath(__file__))), "tests", "stuff")
+BOUNDARY = "----gongishbenchmark"
+MULTIPART_BODY = (
+    f"--{BOUNDARY}\r\n"
+    'Content-Disposition: form-data; name="title"\r\n\r\n'
+    "Hello\r\n"
+    f"--{BOUNDARY}\r\n"
+    'Content-Disposition: form-data; name="avatar"; filename="a.png"\r\n'
+    "Content-Type: image/png\r\n\r\n"
+    f"{'x' * 4096}\r\n"
+    f"--{BOUNDARY}--\r\n"
+).encode()
+ROWS = [dict(id=i, name=f"user{i}", active=i % 2 == 0) for i in range(20)]
+
+
+def create_app():
+    app = Application()
+    app.config.debug = False
+    app.add_static("/static", STUFF_DIR)
+    app.add_static("/cached", STUFF_DIR, cache_size=64)
+    app.add_static("/manifest", STUFF_DIR, manifest=True)
+
+    @app.text("/text")
+    def get():
+        return "Hello World!"
+
+    @app.json("/json")
+    def get():
+        return ROWS
+
+    @app.json("/json_cached", cache=60)
+    def get():
+        return ROWS
+
+    @app.text("/chunked")
+    @app.chunked
+    def get():
+        for i in range(10):
+            yield f"chunk {i}"
+
+    @app.json("/form")
+    def post():
+        form = app.request.form
+        return dict(title=form["title"], avatar=form["avatar"].filename)
+
+    @app.text("/notfound")
+    def get():
+        raise HTTPNotFound
+
+    @app.text("/error")
+    def get():
+        return 1 / 0
+
+    return app
+
+
+def bare_app(environ, start_response):
+    """Baseline, the least any WSGI application has to do"""
+    body = b"Hello World!"
+    start_response(
+        "200 OK",
+        [("Content-Type", "text/plain"), ("Content-Length", str(len(body)))],
+    )
+    return [body]
+
+
+SCENARIOS = {
+    "text": dict(path="/text"),
+    "json": dict(path="/json"),
+    "json_cached": dict(path="/json_cached"),
+    "chunked": dict(path="/chunked"),
+    "static": dict(path="/static/index.html"),
+    "static_large": dict(path="/static/img1.png"),
+    "static_cached": dict(path="/cached/index.html"),
+    "static_manifest": dict(path="/manifest/index.html"),
+    "static_miss": dict(path="/static/nothing/here.css"),
+    "static_manifest_miss": dict(path="/manifest/nothing/here.css"),
+    "multipart": dict(
+        path="/form",
+        method="POST",
+        body=MULTIPART_BODY,
+        content_type=f"multipart/form-data; boundary={BOUNDARY}",
+    ),
+    "not_found": dict(path="/nothing/here"),
+    "exception": dict(path="/error"),
+}
+
+
+def make_environ(path, method="GET", body=b"", content_type=None):
+    environ = {
+        "REQUEST_METHOD": method,
+        "PATH_INFO": path,
+        "QUERY_STRING": "",
+        "wsgi.input": io.BytesIO(body),
+    }
+    if body:
+        environ["CONTENT_LENGTH"] = str(len(body))
+    if content_type:
+        environ["CONTENT_TYPE"] = content_type
+    setup_testing_defaults(environ)
+    return environ
+
+
+def start_response(status, headers, exc_info=None):
+    pass
+
+
+def request(app, scenario):
+    result = app(make_environ(**scenario), start_response)
+    for _ in result:
+        pass
+
+    close = getattr(result, "close", None)
+    if close:
+        close()
+
+
+def measure(app, scenario, duration):
+    """Return requests per second"""
+    count = 0
+    batch = 50
+    start = time.perf_counter()
+    deadline = start + duration
+    while True:
+        for _ in range(batch):
+            request(app, scenario)
+        count += batch
+        now = time.perf_counter()
+        if now >= deadline:
+            return count / (now - start)
+
+
+def run(duration, scenarios):
+    app = create_app()
+    bare = measure(bare_app, SCENARIOS["text"], duration)
+    results = {
+        "gongish": __version__,
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "bare_wsgi_rps": round(bare, 1),
+        "scenarios": {},
+    }
+    for name in scenarios:
+        rps = measure(app, SCENARIOS[name], duration)
+        results["scenarios"][name] = {
+            "rps": round(rps, 1),
+            "us_per_request": round(1e6 / rps, 2),
+            "bare_wsgi_ratio": round(rps / bare, 4),
+        }
+        print(f"{name}: {rps:.0f} req/s", file=sys.stderr)
+
+    return results
+
+
+def compare(results, baseline, max_regression, relative=False):
+    """
+    Return the list of failures against the baseline, with ``relative``
+    the req/s are scaled by the bare WSGI req/s of each run first, to
+    compensate the speed difference of machines.
+    """
+    scale = 1.0
+    if relative:
+        scale = baseline["bare_wsgi_rps"] / results["bare_wsgi_rps"]
+
+    failures = []
+    for name, result in results["scenarios"].items():
+        if name not in baseline["scenarios"]:
+            continue
+
+        expected = baseline["scenarios"][name]["rps"]
+        change = (result["rps"] * scale - expected) / expected * 100
+        result["baseline_change_percent"] = round(change, 2)
+        if change < -max_regression:
+            failures.append(
+                f"{name}: {result['rps']:.0f} req/s is {-change:.1f}% "
+                f"slower than the baseline ({expected:.0f} req/s)"
+            )
+
+    return failures
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    p.add_argument(
+        "--duration",
+        type=float,
+        default=1.0,
+        help="Seconds to run each scenario (default: 1)",
+    )
+    p.add_argument(
+        "--scenarios",
+        default=",".join(SCENARIOS),
+        help="Comma separated scenarios to run",
+    )
+    p.add_argument("--output", help="Output JSON file (default: stdout)")
+    p.add_argument("--baseline", help="Baseline JSON file to compare with")
+    p.add_argument(
+        "--save-baseline", help="Store the results as the baseline file"
+    )
+    p.add_argument(
+        "--max-regression",
+        type=float,
+        default=10.0,
+        help="Allowed req/s drop against baseline, in percent (default: 10)",
+    )
+    p.add_argument(
+        "--relative",
+        action="store_true",
+        help="Compare with baseline relative to the bare WSGI req/s",
+    )
+    args = p.parse_args(argv)
+
+    # Keep the exception scenario quiet
+    logging.getLogger("gongish").addHandler(logging.NullHandler())
+    logging.getLogger("gongish").propagate = False
+
+    results = run(args.duration, args.scenarios.split(","))
+
+    failures = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            failures = compare(
+                results, json.load(f), args.max_regression, args.relative
+            )
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            f.write(output)
+
+    for failure in failures:
+        print(f"REGRESSION {failure}", file=sys.stderr)
+
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -18,11 +18,16 @@ from .exceptions import (
     HTTPNotFound,
     HTTPNotModified,
     HTTPPartialContent,
+    HTTPPayloadTooLarge,
+    HTTPRangeNotSatisfiable,
     HTTPRedirect,
     HTTPResetContent,
     HTTPStatus,
     HTTPTooManyRequests,
     HTTPUnauthorized,
 )
+from .request import BodyLimits
+from .response import CachePolicy, Compression, ResponseCache
+from .response_formatters import ServerSentEvent
 
 __version__ = "1.5.0"
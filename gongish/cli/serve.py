@@ -1,6 +1,9 @@
 import importlib
+import os
 from argparse import ArgumentParser
-from wsgiref.simple_server import make_server
+from wsgiref import simple_server
+
+from ..helpers import FileWrapper
 
 p = ArgumentParser(
     prog="gongish serve",
@@ -21,6 +24,72 @@ p.add_argument(
 )
 
 
+class ServerHandler(simple_server.ServerHandler):
+    """Send the wrapped files with ``os.sendfile``"""
+
+    wsgi_file_wrapper = FileWrapper
+
+    def sendfile(self):
+        if not hasattr(os, "sendfile"):  # pragma: nocover
+            return False
+
+        try:
+            infd = self.result.fileno()
+            outfd = self.request_handler.connection.fileno()
+            offset = self.result.filelike.tell()
+            remaining = self.result.length
+            if remaining is None:
+                remaining = os.fstat(infd).st_size - offset
+        except (AttributeError, OSError):
+            return False
+
+        if not self.headers_sent:
+            self.send_headers()
+        self._flush()
+
+        while remaining > 0:
+            sent = os.sendfile(outfd, infd, offset, remaining)
+            if not sent:
+                break
+            offset += sent
+            remaining -= sent
+            self.bytes_sent += sent
+
+        return True
+
+
+class WSGIRequestHandler(simple_server.WSGIRequestHandler):
+    def handle(self):
+        """Handle a single HTTP request"""
+
+        self.raw_requestline = self.rfile.readline(65537)
+        if len(self.raw_requestline) > 65536:
+            self.requestline = ""
+            self.request_version = ""
+            self.command = ""
+            self.send_error(414)
+            return
+
+        if not self.parse_request():  # An error code has been sent
+            return
+
+        handler = ServerHandler(
+            self.rfile,
+            self.wfile,
+            self.get_stderr(),
+            self.get_environ(),
+            multithread=False,
+        )
+        handler.request_handler = self  # backpointer for logging
+        handler.run(self.server.get_app())
+
+
+def make_server(host, port, app):
+    return simple_server.make_server(
+        host, port, app, handler_class=WSGIRequestHandler
+    )
+
+
 def main(args):
     args = p.parse_args(args)
     module_name, module_attr = args.module.split(":")
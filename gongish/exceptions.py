@@ -18,6 +18,7 @@ class HTTPStatus(Exception):
         return f"{self.code} {self.text}"
 
     def setup_response(self, app) -> str:
+        app.response.status = self.status
         if not self.__class__._keep_body:
             app.response.body = None
             app.response.type = None
@@ -81,6 +82,16 @@ class HTTPPreconditionFailed(HTTPKnownStatus):
     text = "Precondition Failed"
 
 
+class HTTPPayloadTooLarge(HTTPKnownStatus):
+    code = 413
+    text = "Payload Too Large"
+
+
+class HTTPRangeNotSatisfiable(HTTPKnownStatus):
+    code = 416
+    text = "Range Not Satisfiable"
+
+
 class HTTPTooManyRequests(HTTPKnownStatus):
     code = 429
     text = "Too Many Requests"
@@ -111,7 +122,7 @@ class HTTPFound(HTTPRedirect):
 class HTTPNotModified(HTTPKnownStatus):
     code = 304
     text = "Not Modified"
-    _keep_body_ = False
+    _keep_body = False
 
 
 class HTTPInternalServerError(HTTPKnownStatus):
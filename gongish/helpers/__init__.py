@@ -1,4 +1,13 @@
 # flake8: noqa
+from .filewrapper import FileWrapper
 from .headerset import HeaderSet
+from .jsoncodec import (
+    JSONCodec,
+    OrjsonCodec,
+    StdlibJSONCodec,
+    UJSONCodec,
+    default_json_codec,
+)
 from .lazyattr import LazyAttribute
+from .lrucache import LRUCache
 from .wordrouter import WordRouter
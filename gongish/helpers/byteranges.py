@@ -0,0 +1,125 @@
+def parse_range(header, size, max_ranges=16):
+    """
+    Parse a ``Range`` header, RFC 7233.
+
+    Return the sorted and merged ``(first, last)`` byte positions, ``None``
+    when the header must be ignored (invalid, not in bytes, or too many
+    ranges) or an empty list when none of the ranges is satisfiable.
+
+    >>> parse_range("bytes=0-9, 5-14, -5", 100)
+    [(0, 14), (95, 99)]
+    >>> parse_range("bytes=100-", 100)
+    []
+    >>> parse_range("items=0-9", 100) is None
+    True
+    """
+    unit, _, specs = header.partition("=")
+    if unit.strip().lower() != "bytes":
+        return None
+
+    ranges = []
+    for spec in specs.split(","):
+        first, sep, last = spec.strip().partition("-")
+        if not sep:
+            return None
+
+        try:
+            if first:
+                first = int(first)
+                if last:
+                    last = int(last)
+                    if first > last:
+                        return None
+
+                else:
+                    last = size - 1
+
+            else:
+                suffix = int(last)
+                if suffix < 0:
+                    return None
+
+                if not suffix:
+                    continue
+
+                first = max(size - suffix, 0)
+                last = size - 1
+
+        except ValueError:
+            return None
+
+        if first < 0:
+            return None
+
+        if first < size:
+            ranges.append((first, min(last, size - 1)))
+
+    ranges.sort()
+    merged = []
+    for first, last in ranges:
+        if merged and first <= merged[-1][1] + 1:
+            if last > merged[-1][1]:
+                merged[-1] = (merged[-1][0], last)
+        else:
+            merged.append((first, last))
+
+    if len(merged) > max_ranges:
+        return None
+
+    return merged
+
+
+class MultipartByteranges:
+    """
+    The ``multipart/byteranges`` body of a multiple ranges response, only
+    the requested bytes are read from the file.
+    """
+
+    __slots__ = ("filelike", "parts", "boundary", "blksize", "length")
+
+    def __init__(
+        self, filelike, ranges, size, contenttype, boundary, blksize=0x4000
+    ):
+        self.filelike = filelike
+        self.boundary = boundary
+        self.blksize = blksize
+        self.parts = [
+            (
+                (
+                    f"--{boundary}\r\n"
+                    f"content-type: {contenttype}\r\n"
+                    f"content-range: bytes {first}-{last}/{size}\r\n"
+                    "\r\n"
+                ).encode(),
+                first,
+                last - first + 1,
+            )
+            for first, last in ranges
+        ]
+        self.length = sum(
+            len(head) + length + 2 for head, _, length in self.parts
+        ) + len(boundary) + 6
+
+    @property
+    def contenttype(self):
+        return f"multipart/byteranges; boundary={self.boundary}"
+
+    def __iter__(self):
+        f = self.filelike
+        blksize = self.blksize
+        for head, offset, remaining in self.parts:
+            yield head
+            f.seek(offset)
+            while remaining:
+                data = f.read(min(blksize, remaining))
+                if not data:
+                    break
+                remaining -= len(data)
+                yield data
+
+            yield b"\r\n"
+
+        yield f"--{self.boundary}--\r\n".encode()
+
+    def close(self):
+        self.filelike.close()
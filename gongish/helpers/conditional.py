@@ -0,0 +1,81 @@
+from calendar import timegm
+from time import strptime
+
+from ..constants import HTTP_DATETIME_FORMAT
+
+
+def make_etag(stat, weak=False):
+    """Make an entity tag from inode, size and modification time"""
+    etag = f'"{stat.st_ino:x}-{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+    return f"W/{etag}" if weak else etag
+
+
+def parse_http_date(value):
+    """Return the timestamp of an HTTP date or ``None`` when invalid"""
+    try:
+        return timegm(strptime(value, HTTP_DATETIME_FORMAT))
+    except (TypeError, ValueError):
+        return None
+
+
+def etag_matches(header, etag):
+    """
+    Weak comparison of an ``If-None-Match`` header with an entity tag.
+
+    >>> etag_matches('W/"a", "b"', '"a"')
+    True
+    >>> etag_matches('"b"', 'W/"a"')
+    False
+    """
+    header = header.strip()
+    if header == "*":
+        return True
+
+    if etag.startswith("W/"):
+        etag = etag[2:]
+
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+
+        if candidate == etag:
+            return True
+
+    return False
+
+
+def not_modified(environ, etag=None, mtime=None):
+    """
+    Evaluate the ``If-None-Match`` and ``If-Modified-Since`` headers,
+    the second one is ignored when the first one is present, RFC 7232.
+    """
+    if_none_match = environ.get("HTTP_IF_NONE_MATCH")
+    if if_none_match is not None:
+        return etag is not None and etag_matches(if_none_match, etag)
+
+    if_modified_since = environ.get("HTTP_IF_MODIFIED_SINCE")
+    if if_modified_since is None or mtime is None:
+        return False
+
+    since = parse_http_date(if_modified_since)
+    return since is not None and int(mtime) <= since
+
+
+def if_range_matches(environ, etag=None, last_modified=None):
+    """
+    Whether the ``Range`` header may be honoured according to ``If-Range``,
+    which requires a strong validator.
+    """
+    if_range = environ.get("HTTP_IF_RANGE")
+    if if_range is None:
+        return True
+
+    if_range = if_range.strip()
+    if if_range.startswith('"'):
+        return etag is not None and if_range == etag
+
+    if if_range.startswith("W/"):
+        return False
+
+    return last_modified is not None and if_range == last_modified
@@ -0,0 +1,96 @@
+import zlib
+
+
+def parse_accept_encoding(header):
+    """
+    Map the content codings of an ``Accept-Encoding`` header to their
+    quality values.
+
+    >>> parse_accept_encoding("gzip, br;q=0.8, *;q=0")
+    {'gzip': 1.0, 'br': 0.8, '*': 0.0}
+    """
+    result = {}
+    for item in header.split(","):
+        coding, _, params = item.partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+
+        quality = 1.0
+        params = params.strip()
+        if params[:2].lower() == "q=":
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+
+        if coding == "x-gzip":
+            coding = "gzip"
+
+        result[coding] = quality
+
+    return result
+
+
+def negotiate_encoding(header, available):
+    """
+    Choose one of the ``available`` content codings, in order of
+    preference, or ``None`` for the identity.
+
+    >>> negotiate_encoding("gzip, br", ("br", "gzip"))
+    'br'
+    >>> negotiate_encoding("gzip;q=0.5, br;q=0.1", ("br", "gzip"))
+    'gzip'
+    >>> negotiate_encoding("identity", ("br", "gzip")) is None
+    True
+    """
+    if not header:
+        return None
+
+    qualities = parse_accept_encoding(header)
+    wildcard = qualities.get("*", 0.0)
+    best = None
+    best_quality = 0.0
+    for coding in available:
+        quality = qualities.get(coding, wildcard)
+        if quality > best_quality:
+            best = coding
+            best_quality = quality
+
+    return best
+
+
+# Window bits of ``zlib`` for the content codings, RFC 7230 section 4.2
+ZLIB_WBITS = {"gzip": 31, "deflate": 15}
+
+
+def compressor(coding, level=6):
+    return zlib.compressobj(level, zlib.DEFLATED, ZLIB_WBITS[coding])
+
+
+def compress_chunks(chunks, compressor, flush=False):
+    """
+    Compress a stream incrementally, with ``flush`` every chunk is sent as
+    soon as it is produced, at the cost of the compression ratio.
+    """
+    compress = compressor.compress
+    for chunk in chunks:
+        data = compress(chunk)
+        if flush:
+            data += compressor.flush(zlib.Z_SYNC_FLUSH)
+
+        if data:
+            yield data
+
+    yield compressor.flush()
+
+
+def add_vary(headers, name):
+    """Append a header name to the ``Vary`` header, once"""
+    vary = headers.get("vary")
+    if not vary:
+        headers["vary"] = name
+    elif vary != "*" and name not in (
+        i.strip().lower() for i in vary.split(",")
+    ):
+        headers["vary"] = f"{vary}, {name}"
@@ -0,0 +1,44 @@
+class FileWrapper:
+    """
+    Iterable over a file, compatible with ``wsgi.file_wrapper``.
+
+    Used when the WSGI server does not provide one. Servers may recognize
+    it to send the file with ``os.sendfile`` instead of iterating it, see
+    ``gongish serve``.
+
+    When ``length`` is given, no more than ``length`` bytes are read from
+    the current position of the file.
+    """
+
+    __slots__ = ("filelike", "blksize", "length")
+
+    def __init__(self, filelike, blksize=0x4000, length=None):
+        self.filelike = filelike
+        self.blksize = blksize
+        self.length = length
+
+    def fileno(self):
+        return self.filelike.fileno()
+
+    def __iter__(self):
+        read = self.filelike.read
+        blksize = self.blksize
+        remaining = self.length
+        if remaining is None:
+            while True:
+                data = read(blksize)
+                if not data:
+                    break
+                yield data
+
+            return
+
+        while remaining:
+            data = read(min(blksize, remaining))
+            if not data:
+                break
+            remaining -= len(data)
+            yield data
+
+    def close(self):
+        self.filelike.close()
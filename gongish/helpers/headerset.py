@@ -1,15 +1,92 @@
-from collections import OrderedDict
+import sys
 
 content_environ = ("HTTP_CONTENT_TYPE", "HTTP_CONTENT_LENGTH")
 content_headers = ("CONTENT_TYPE", "CONTENT_LENGTH")
 
+# Interned lowercase header names, by the name as given
+_names = {}
+_names_max = 1024
+
+# Pre-built ``(name, value)`` tuples of the most common headers, by value
+prebuilt = {
+    name: {}
+    for name in (
+        "accept-ranges",
+        "cache-control",
+        "content-encoding",
+        "content-length",
+        "content-type",
+        "transfer-encoding",
+        "vary",
+    )
+}
+prebuilt_max = 256
+
+
+def header_name(name):
+    """
+    Lowercase and intern a header name.
+
+    >>> header_name("Content-Type")
+    'content-type'
+    """
+    result = _names.get(name)
+    if result is None:
+        result = name.lower()
+        if len(_names) < _names_max:
+            result = _names[name] = sys.intern(result)
+
+    return result
+
+
+def header_item(name, value):
+    """The ``(name, value)`` tuple of a lowercase name, reused if common"""
+    values = prebuilt.get(name)
+    if values is None:
+        return (name, value)
+
+    item = values.get(value)
+    if item is None:
+        item = (name, value)
+        if len(values) < prebuilt_max:
+            values[value] = item
+
+    return item
+
+
+class HeaderSet:
+    """
+    HTTP headers, as a list of ``(name, value)`` tuples with lowercase
+    names.
+
+    Item access works on the first value of a name, while :meth:`add`
+    appends another one, e.g. for multiple ``Set-Cookie`` headers.
+
+    >>> headers = HeaderSet()
+    >>> headers["Content-Type"] = "text/plain"
+    >>> headers.add("set-cookie", "a=1")
+    >>> headers.add("set-cookie", "b=2")
+    >>> headers.wsgi()  # doctest: +NORMALIZE_WHITESPACE
+    [('content-type', 'text/plain'), ('set-cookie', 'a=1'),
+     ('set-cookie', 'b=2')]
+    """
+
+    __slots__ = ("_items", "_repeated")
+    __hash__ = None
 
-class HeaderSet(OrderedDict):  # pragma: nocover
     def __init__(self, items=None):
-        super().__init__()
+        self._items = []
+        self._repeated = False
         for i in items or []:
             self.add(i)
 
+    def wsgi(self):
+        """
+        The ``(name, value)`` list for ``start_response``, a copy as the
+        servers may append their own headers to it.
+        """
+        return list(self._items)
+
     def add(self, k, *args):
         if isinstance(k, str):
             values = []
@@ -24,24 +101,126 @@ class HeaderSet(OrderedDict):  # pragma: nocover
         if args:
             values += args
 
-        self[k] = "; ".join(values)
+        name = header_name(k)
+        if not self._repeated and name in self:
+            self._repeated = True
+
+        self._items.append(header_item(name, "; ".join(values)))
+
+    def get(self, k, default=None):
+        name = header_name(k)
+        for key, value in self._items:
+            if key == name:
+                return value
+
+        return default
+
+    def get_all(self, k):
+        """All the values of a header, in order"""
+        name = header_name(k)
+        return [value for key, value in self._items if key == name]
 
     def __getitem__(self, k):
-        return super().__getitem__(k.lower())
+        name = header_name(k)
+        for key, value in self._items:
+            if key == name:
+                return value
+
+        raise KeyError(k)
 
     def __setitem__(self, k, v):
-        return super().__setitem__(k.lower(), v)
+        name = header_name(k)
+        item = header_item(name, v)
+        items = self._items
+        for index, existing in enumerate(items):
+            if existing[0] == name:
+                items[index] = item
+                if self._repeated:
+                    start = index + 1
+                    items[start:] = [i for i in items[start:] if i[0] != name]
+                return
+
+        items.append(item)
 
     def __delitem__(self, k):
-        return super().__delitem__(k)
+        if self.pop(k, self) is self:
+            raise KeyError(k)
+
+    def pop(self, k, *default):
+        name = header_name(k)
+        items = self._items
+        for index, (key, value) in enumerate(items):
+            if key == name:
+                del items[index]
+                if self._repeated:
+                    items[index:] = [i for i in items[index:] if i[0] != name]
+                return value
+
+        if default:
+            return default[0]
+
+        raise KeyError(k)
+
+    def __contains__(self, k):
+        name = header_name(k)
+        for key, _ in self._items:
+            if key == name:
+                return True
+
+        return False
+
+    def __len__(self):
+        return len(self._items)
+
+    def __eq__(self, other):
+        if isinstance(other, HeaderSet):
+            return self._items == other._items
+
+        return dict(self._items) == other
+
+    def keys(self):
+        return [key for key, _ in self._items]
+
+    def values(self):
+        return [value for _, value in self._items]
+
+    def items(self):
+        return self._items
+
+    def update(self, other):
+        """
+        Replace the headers by the ones of a mapping, a :class:`HeaderSet`
+        or an iterable of ``(name, value)`` pairs. The repeated names of
+        ``other`` are all kept.
+        """
+        if hasattr(other, "items"):
+            other = other.items()
+
+        items = self._items
+        fresh = not items
+        seen = set()
+        for k, v in other:
+            name = header_name(k)
+            if name in seen:
+                self._repeated = True
+                items.append(header_item(name, v))
+            elif fresh:
+                seen.add(name)
+                items.append(header_item(name, v))
+            else:
+                seen.add(name)
+                self[name] = v
 
     def __iter__(self):
-        for k, v in self.items():
+        for k, v in self._items:
             yield f"{k}: {v}"
 
     def __str__(self):
         return "\r\n".join(self)
 
+    def __repr__(self):
+        return f"{self.__class__.__name__}({self._items!r})"
+
     def __iadd__(self, other):
         for i in other:
             self.add(i)
@@ -49,13 +228,14 @@ class HeaderSet(OrderedDict):  # pragma: nocover
         return self
 
     def load_from_wsgi_environ(self, environ):
+        items = self._items
         for key, value in environ.items():
             if key.startswith("HTTP_") and key not in content_environ:
-                header_name = key[5:].replace("_", "-")
-                self[header_name] = value
+                items.append(
+                    (header_name(key[5:].replace("_", "-")), value)
+                )
 
             elif key in content_headers and value:
-                header_name = key.replace("_", "-")
-                self[header_name] = value
+                items.append((header_name(key.replace("_", "-")), value))
 
         return self
@@ -0,0 +1,112 @@
+import json
+
+try:
+    import orjson
+except ImportError:  # pragma: nocover
+    orjson = None
+
+try:
+    import ujson
+except ImportError:  # pragma: nocover
+    ujson = None
+
+
+class JSONCodec:
+    """
+    Base class of the JSON codecs, ``binary`` codecs produce UTF-8
+    encoded bytes directly instead of ``str``.
+    """
+
+    binary = False
+
+    def dumps(self, value, indent=None):  # pragma: nocover
+        raise NotImplementedError
+
+    def loads(self, data):  # pragma: nocover
+        raise NotImplementedError
+
+    def dumps_iter(self, items, buffer_size=0x4000):
+        """
+        Encode the iterable as a JSON array incrementally, yields chunks of
+        about ``buffer_size`` so only one chunk is in memory at once.
+        """
+        if self.binary:
+            opening, separator, closing, join = b"[", b",", b"]", b"".join
+        else:
+            opening, separator, closing, join = "[", ",", "]", "".join
+
+        dumps = self.dumps
+        chunk = [opening]
+        size = 0
+        first = True
+        for item in items:
+            if first:
+                first = False
+            else:
+                chunk.append(separator)
+
+            encoded = dumps(item)
+            chunk.append(encoded)
+            size += len(encoded) + 1
+            if size >= buffer_size:
+                yield join(chunk)
+                chunk = []
+                size = 0
+
+        chunk.append(closing)
+        yield join(chunk)
+
+
+class StdlibJSONCodec(JSONCodec):
+    def dumps(self, value, indent=None):
+        return json.dumps(value, indent=indent)
+
+    def loads(self, data):
+        return json.loads(data)
+
+
+class UJSONCodec(JSONCodec):  # pragma: nocover
+    def dumps(self, value, indent=None):
+        # ujson 4.x patch
+        # https://github.com/ultrajson/ultrajson/issues/317
+        if indent is None:
+            indent = 0
+        return ujson.dumps(value, indent=indent)
+
+    def loads(self, data):
+        return ujson.loads(data)
+
+
+class OrjsonCodec(JSONCodec):
+    """
+    orjson based codec, indentation is always two spaces when requested.
+    """
+
+    binary = True
+
+    def __init__(self):
+        if orjson is None:
+            raise ImportError("OrjsonCodec requires the orjson package")
+
+    def dumps(self, value, indent=None):
+        option = orjson.OPT_NON_STR_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(value, option=option)
+
+    def loads(self, data):
+        return orjson.loads(data)
+
+
+def default_json_codec():
+    """
+    ujson when available, otherwise the stdlib json.
+
+    ``OrjsonCodec`` is never picked by default, as its output differs:
+    compact, non-ASCII characters unescaped and no ``__json__`` nor
+    ``toDict`` support.
+    """
+    if ujson is not None:  # pragma: nocover
+        return UJSONCodec()
+
+    return StdlibJSONCodec()
@@ -0,0 +1,89 @@
+import threading
+from collections import OrderedDict
+
+
+class LRUCache:
+    """
+    Size bounded mapping, evicts the least recently used entries when
+    the ``maxsize`` or the total ``maxbytes`` of the entries (as given to
+    ``set``) exceeded.
+    >>> cache = LRUCache(2)
+    >>> cache.set("a", 1)
+    >>> cache.set("b", 2)
+    >>> cache.get("a")
+    1
+    >>> cache.set("c", 3)
+    >>> cache.get("b") is None
+    True
+    """
+
+    def __init__(self, maxsize=128, maxbytes=None):
+        self.maxsize = maxsize
+        self.maxbytes = maxbytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = OrderedDict()
+        self._sizes = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                value = self._data[key]
+
+            except KeyError:
+                self.misses += 1
+                return default
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, size=0):
+        with self._lock:
+            data = self._data
+            sizes = self._sizes
+            self.bytes += size - sizes.get(key, 0)
+            data[key] = value
+            data.move_to_end(key)
+            if size:
+                sizes[key] = size
+            else:
+                sizes.pop(key, None)
+
+            maxbytes = self.maxbytes
+            while len(data) > self.maxsize or (
+                maxbytes is not None and self.bytes > maxbytes
+            ):
+                evicted, _ = data.popitem(last=False)
+                self.bytes -= sizes.pop(evicted, 0)
+                self.evictions += 1
+
+    def pop(self, key, default=None):
+        with self._lock:
+            self.bytes -= self._sizes.pop(key, 0)
+            return self._data.pop(key, default)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._sizes.clear()
+            self.bytes = 0
+
+    @property
+    def stats(self):
+        return dict(
+            size=len(self._data),
+            bytes=self.bytes,
+            hits=self.hits,
+            misses=self.misses,
+            evictions=self.evictions,
+        )
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
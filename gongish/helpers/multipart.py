@@ -0,0 +1,296 @@
+import re
+from tempfile import SpooledTemporaryFile
+from urllib.parse import parse_qsl
+
+_OPTION_PATTERN = re.compile(
+    r';\s*([^\s=;]+)\s*=\s*("(?:\\.|[^"\\])*"|[^;]*)'
+)
+
+
+class LimitExceeded(ValueError):
+    pass
+
+
+def parse_options(value):
+    """
+    Parse a header value like ``form-data; name="a"`` to the main value
+    and a dictionary of the options.
+    >>> parse_options('form-data; name="a"; filename="b \\\\"c\\\\".txt"')
+    ('form-data', {'name': 'a', 'filename': 'b "c".txt'})
+    """
+    main, _, rest = value.partition(";")
+    options = {}
+    for key, val in _OPTION_PATTERN.findall(";" + rest):
+        val = val.strip()
+        if len(val) > 1 and val[0] == val[-1] == '"':
+            val = val[1:-1].replace("\\\\", "\\").replace('\\"', '"')
+        options[key.lower()] = val
+    return main.strip().lower(), options
+
+
+def parse_urlencoded(data, encoding="utf-8", errors="replace"):
+    if isinstance(data, bytes):
+        data = data.decode(encoding, errors)
+
+    return parse_qsl(
+        data,
+        keep_blank_values=True,
+        strict_parsing=False,
+        encoding=encoding,
+        errors=errors,
+    )
+
+
+class FormFile:
+    """
+    File part of a multipart form, exposes the same attributes the
+    ``cgi.FieldStorage`` did and also works as a readable file object.
+    """
+
+    __slots__ = ("name", "filename", "type", "headers", "file")
+
+    def __init__(self, name, filename, type, headers, file):
+        self.name = name
+        self.filename = filename
+        self.type = type
+        self.headers = headers
+        self.file = file
+
+    @property
+    def value(self):
+        position = self.file.tell()
+        self.file.seek(0)
+        try:
+            return self.file.read()
+        finally:
+            self.file.seek(position)
+
+    def read(self, size=-1):
+        return self.file.read(size)
+
+    def seek(self, offset, whence=0):
+        return self.file.seek(offset, whence)
+
+    def tell(self):
+        return self.file.tell()
+
+    def close(self):
+        self.file.close()
+
+    def __iter__(self):
+        return iter(self.file)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __repr__(self):
+        return f"FormFile({self.name!r}, {self.filename!r}, {self.type!r})"
+
+
+class MultipartParser:
+    """
+    Incremental ``multipart/form-data`` parser.
+
+    Reads the input by fixed size chunks and yields ``(name, value)`` for
+    each part, ``value`` is ``str`` for the ordinary fields and
+    ``FormFile`` for the file parts. File contents are kept in memory up
+    to ``spool_threshold`` bytes, then rolled over to a temporary file.
+
+    ``LimitExceeded`` is raised as soon as the input passes ``max_size``
+    bytes, a file passes ``max_file_size`` bytes or the parts outnumber
+    ``max_fields``.
+    """
+
+    max_header_size = 0x4000
+
+    def __init__(
+        self,
+        fp,
+        boundary,
+        length=None,
+        chunk_size=0x10000,
+        spool_threshold=0x100000,
+        encoding="utf-8",
+        errors="replace",
+        max_size=None,
+        max_file_size=None,
+        max_fields=None,
+    ):
+        if not boundary:
+            raise ValueError("Invalid boundary in multipart form")
+
+        if isinstance(boundary, str):
+            boundary = boundary.encode("latin-1")
+
+        self.fp = fp
+        self.opening = b"--" + boundary
+        self.delimiter = b"\r\n" + self.opening
+        self.remaining = length
+        self.chunk_size = chunk_size
+        self.spool_threshold = spool_threshold
+        self.encoding = encoding
+        self.errors = errors
+        self.max_size = max_size
+        self.max_file_size = max_file_size
+        self.max_fields = max_fields
+        self.size = 0
+
+    def read(self):
+        """Read the next chunk, an empty bytes means end of input"""
+        size = self.chunk_size
+        if self.max_size is not None:
+            # Read no more than one byte past the limit
+            size = min(size, self.max_size - self.size + 1)
+
+        remaining = self.remaining
+        if remaining is None:
+            chunk = self.fp.read(size)
+
+        elif remaining <= 0:
+            return b""
+
+        else:
+            chunk = self.fp.read(min(size, remaining))
+            self.remaining -= len(chunk)
+
+        self.size += len(chunk)
+        if self.max_size is not None and self.size > self.max_size:
+            raise LimitExceeded("Too large multipart form")
+
+        return chunk
+
+    def feed(self, buf):
+        chunk = self.read()
+        if not chunk:
+            raise ValueError("Unexpected end of multipart form")
+        return buf + chunk
+
+    def parse_headers(self, data):
+        headers = {}
+        for line in data.decode(self.encoding, self.errors).split("\r\n"):
+            key, sep, value = line.partition(":")
+            if not sep:
+                raise ValueError("Invalid multipart header")
+            headers[key.strip().lower()] = value.strip()
+        return headers
+
+    def __iter__(self):
+        opening = self.opening
+        delimiter = self.delimiter
+        keep = len(delimiter) - 1
+        max_file_size = self.max_file_size
+        fields = 0
+
+        # Skip the preamble
+        buf = b""
+        while True:
+            index = buf.find(opening)
+            if index >= 0:
+                buf = buf[index + len(opening) :]
+                break
+
+            buf = self.feed(buf[-len(opening) :])
+
+        while True:
+            # Right after the boundary, closing dashes or a line break
+            while len(buf) < 2:
+                buf = self.feed(buf)
+
+            if buf[:2] == b"--":
+                return
+
+            while True:
+                index = buf.find(b"\r\n", 0, 0x100)
+                if index >= 0:
+                    break
+
+                if len(buf) >= 0x100:
+                    raise ValueError("Invalid multipart boundary")
+
+                buf = self.feed(buf)
+
+            if buf[:index].strip():
+                raise ValueError("Invalid multipart boundary")
+
+            buf = buf[index + 2 :]
+
+            # Part headers
+            while len(buf) < 2:
+                buf = self.feed(buf)
+
+            if buf[:2] == b"\r\n":
+                headers = {}
+                buf = buf[2:]
+
+            else:
+                while True:
+                    index = buf.find(b"\r\n\r\n")
+                    if index >= 0:
+                        break
+
+                    if len(buf) > self.max_header_size:
+                        raise ValueError("Too large multipart header")
+
+                    buf = self.feed(buf)
+
+                headers = self.parse_headers(buf[:index])
+                buf = buf[index + 4 :]
+
+            _, options = parse_options(
+                headers.get("content-disposition", "")
+            )
+            fields += 1
+            if self.max_fields is not None and fields > self.max_fields:
+                raise LimitExceeded("Too many multipart fields")
+
+            filename = options.get("filename")
+            if filename is None:
+                target = bytearray()
+                write = target.extend
+
+            else:
+                target = SpooledTemporaryFile(max_size=self.spool_threshold)
+                if max_file_size is None:
+                    write = target.write
+
+                else:
+
+                    def write(data, target=target):
+                        if target.tell() + len(data) > max_file_size:
+                            target.close()
+                            raise LimitExceeded("Too large multipart file")
+                        target.write(data)
+
+            # Part body
+            while True:
+                index = buf.find(delimiter)
+                if index >= 0:
+                    write(buf[:index])
+                    buf = buf[index + len(delimiter) :]
+                    break
+
+                if len(buf) > keep:
+                    write(buf[:-keep])
+                    buf = buf[-keep:]
+
+                buf = self.feed(buf)
+
+            name = options.get("name")
+            if name is None:
+                continue
+
+            if filename is None:
+                yield name, target.decode(self.encoding, self.errors)
+
+            else:
+                target.seek(0)
+                yield name, FormFile(
+                    name,
+                    filename,
+                    headers.get("content-type", "text/plain"),
+                    headers,
+                    target,
+                )
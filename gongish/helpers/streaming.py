@@ -0,0 +1,33 @@
+def coalesce(chunks, buffer_size=0):
+    """
+    Merge the small chunks of a stream to fewer and larger ones, of at
+    least ``buffer_size`` bytes.
+
+    The first chunk is yielded as is, so the response starts right away.
+    As the stream is pulled, a pending chunk waits for the next ones till
+    the buffer fills, so it is not meant for live feeds.
+
+    >>> list(coalesce(["a", "bc", "d", "efg", "h"], buffer_size=3))
+    ['a', 'bcd', 'efg', 'h']
+    """
+    chunks = iter(chunks)
+    if not buffer_size:
+        yield from chunks
+        return
+
+    for chunk in chunks:
+        yield chunk
+        break
+
+    buffer = []
+    size = 0
+    for chunk in chunks:
+        buffer.append(chunk)
+        size += len(chunk)
+        if size >= buffer_size:
+            yield chunk[:0].join(buffer)
+            buffer = []
+            size = 0
+
+    if buffer:
+        yield buffer[0][:0].join(buffer)
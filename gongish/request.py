@@ -1,11 +1,4 @@
-import cgi
 import wsgiref.util as wsgiutil
-
-try:
-    import ujson as json
-except ImportError:  # pragma: no cover
-    import json
-
 from datetime import date, datetime, time
 from http import cookies
 from urllib.parse import parse_qs
@@ -16,57 +9,156 @@ from gongish.constants import (
     ISO_DATETIME_PATTERN,
     ISO_TIME_FORMAT,
 )
-from gongish.exceptions import HTTPBadRequest
-from gongish.helpers import HeaderSet, LazyAttribute
+from gongish.exceptions import HTTPBadRequest, HTTPPayloadTooLarge
+from gongish.helpers import HeaderSet, LazyAttribute, default_json_codec
+from gongish.helpers.multipart import (
+    LimitExceeded,
+    MultipartParser,
+    parse_options,
+    parse_urlencoded,
+)
+
+
+class BodyLimits:
+    """
+    Request body limits, ``None`` means unlimited.
 
+    :param body_size: Maximum bytes of the request body
+    :param form_fields: Maximum count of the form fields in the body
+    :param file_size: Maximum bytes of each uploaded file
+    """
 
-def getcgifieldvalue(field):
-    return (
-        field.value
-        if isinstance(field, cgi.MiniFieldStorage)
-        or (isinstance(field, cgi.FieldStorage) and not field._binary_file)
-        else field
-    )
+    __slots__ = ("body_size", "form_fields", "file_size")
+
+    def __init__(self, body_size=None, form_fields=None, file_size=None):
+        self.body_size = body_size
+        self.form_fields = form_fields
+        self.file_size = file_size
+
+    def override(self, other):
+        """Return a new limits, the ones set in ``other`` take precedence"""
+        values = []
+        for key in self.__slots__:
+            value = getattr(other, key)
+            values.append(getattr(self, key) if value is None else value)
+
+        return BodyLimits(*values)
+
+    def check_length(self, contentlength):
+        """Reject the too large declared content length, before reading"""
+        if (
+            self.body_size is not None
+            and contentlength is not None
+            and contentlength > self.body_size
+        ):
+            raise HTTPPayloadTooLarge()
 
 
 class RequestForm(dict):
-    def __init__(self, environ, contenttype, contentlength):
+    chunk_size = 0x10000
+    spool_threshold = 0x100000
+
+    def __init__(
+        self,
+        environ,
+        contenttype,
+        contentlength,
+        limits=None,
+        json_codec=None,
+    ):
+        limits = limits or BodyLimits()
+        limits.check_length(contentlength)
+
         if contenttype == "application/json":
             if contentlength is None:
                 raise HTTPBadRequest
 
-            fp = environ["wsgi.input"]
+            codec = json_codec or Request.json_codec
             try:
-                super().__init__(json.load(fp))
+                # Single bounded read, codecs parse bytes directly
+                super().__init__(
+                    codec.loads(environ["wsgi.input"].read(contentlength))
+                )
                 return
 
             except (ValueError, AttributeError, TypeError):
                 raise HTTPBadRequest("Cannot parse the request")
 
-        if "QUERY_STRING" not in environ:
-            environ["QUERY_STRING"] = ""
+        super().__init__()
+        query = environ.get("QUERY_STRING", "")
+        if environ.get("REQUEST_METHOD", "GET").upper() in ("GET", "HEAD"):
+            self._extend(parse_urlencoded(query))
+            return
 
         try:
-            storage = cgi.FieldStorage(
-                fp=environ["wsgi.input"],
-                environ=environ,
-                strict_parsing=False,
-                keep_blank_values=True,
-            )
-
-        except (TypeError, ValueError):
+            if contenttype == "multipart/form-data":
+                _, options = parse_options(environ.get("CONTENT_TYPE", ""))
+                self._extend(parse_urlencoded(query))
+                self._extend(
+                    MultipartParser(
+                        environ["wsgi.input"],
+                        options.get("boundary"),
+                        self._bodylength(environ, contentlength),
+                        chunk_size=self.chunk_size,
+                        spool_threshold=self.spool_threshold,
+                        max_size=limits.body_size,
+                        max_file_size=limits.file_size,
+                        max_fields=limits.form_fields,
+                    )
+                )
+
+            elif contenttype in (None, "application/x-www-form-urlencoded"):
+                length = self._bodylength(environ, contentlength)
+                if length is None:
+                    length = -1
+                    if limits.body_size is not None:
+                        length = limits.body_size + 1
+
+                body = environ["wsgi.input"].read(length)
+                if (
+                    limits.body_size is not None
+                    and len(body) > limits.body_size
+                ):
+                    raise LimitExceeded("Too large form")
+
+                fields = parse_urlencoded(body)
+                if (
+                    limits.form_fields is not None
+                    and len(fields) > limits.form_fields
+                ):
+                    raise LimitExceeded("Too many form fields")
+
+                self._extend(fields)
+                self._extend(parse_urlencoded(query))
+
+        except LimitExceeded:
+            raise HTTPPayloadTooLarge()
+
+        except (AttributeError, TypeError, ValueError):
             raise HTTPBadRequest("Cannot parse the request")
 
-        super().__init__()
-        if storage.list is None or not len(storage.list):
-            return
-
-        for k in storage:
-            v = storage[k]
-            if isinstance(v, list):
-                self[k] = [getcgifieldvalue(i) for i in v]
+    @staticmethod
+    def _bodylength(environ, contentlength):
+        """
+        Bytes to read from the input, ``None`` means till the end and is
+        allowed only when the server terminates the input.
+        """
+        if contentlength is None:
+            return None if environ.get("wsgi.input_terminated") else 0
+
+        return contentlength
+
+    def _extend(self, fields):
+        for key, value in fields:
+            if key not in self:
+                self[key] = value
+                continue
+
+            existing = self[key]
+            if isinstance(existing, list):
+                existing.append(value)
             else:
-                self[k] = getcgifieldvalue(v)
+                self[key] = [existing, value]
 
     def get_date(self, key, default=None):
         if key in self:
@@ -148,6 +240,10 @@ class RequestForm(dict):
 
 
 class Request:
+    form_factory = RequestForm
+    limits = None
+    json_codec = default_json_codec()
+
     def __init__(self, environ):
         self.environ = environ
 
@@ -192,7 +288,13 @@ class Request:
 
     @LazyAttribute
     def form(self):
-        return RequestForm(self.environ, self.contenttype, self.contentlength)
+        return self.form_factory(
+            self.environ,
+            self.contenttype,
+            self.contentlength,
+            self.limits,
+            self.json_codec,
+        )
 
     @LazyAttribute
     def cookies(self):
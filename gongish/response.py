@@ -1,6 +1,312 @@
+import hashlib
+import threading
+import time
 import types
 
-from .helpers import HeaderSet
+from .constants import HTTP_DATETIME_FORMAT
+from .exceptions import HTTPNotModified
+from .helpers import HeaderSet, LRUCache
+from .helpers.conditional import etag_matches
+from .helpers.contentcoding import add_vary, compressor, negotiate_encoding
+
+# Headers to repeat in the 304 responses, RFC 7232 section 4.1
+not_modified_headers = (
+    "cache-control",
+    "content-location",
+    "etag",
+    "expires",
+    "last-modified",
+    "vary",
+)
+
+
+class Compression:
+    """
+    Response compression settings.
+
+    :param level: ``zlib`` compression level, from 1 (fastest) to 9
+    :param min_size: Smaller bodies are sent as is
+    :param codings: Supported content codings, in order of preference
+    :param flush: Flush every chunk of the streamed bodies, ``None`` to
+                  flush only the event streams
+    :param excluded_types: Already compressed content types (or prefixes)
+    """
+
+    __slots__ = ("level", "min_size", "codings", "flush", "excluded_types")
+
+    streaming_types = ("text/event-stream", "application/x-ndjson")
+
+    def __init__(
+        self,
+        level=6,
+        min_size=1024,
+        codings=("gzip", "deflate"),
+        flush=None,
+        excluded_types=(
+            "image/png",
+            "image/jpeg",
+            "image/gif",
+            "image/webp",
+            "image/avif",
+            "video/",
+            "audio/",
+            "font/woff",
+            "application/octet-stream",
+            "application/pdf",
+            "application/zip",
+            "application/gzip",
+            "application/x-gzip",
+            "application/x-bzip2",
+            "application/x-xz",
+            "application/x-7z-compressed",
+            "application/zstd",
+        ),
+    ):
+        self.level = level
+        self.min_size = min_size
+        self.codings = codings
+        self.flush = flush
+        self.excluded_types = excluded_types
+
+    def compressible(self, contenttype):
+        return bool(contenttype) and not contenttype.lower().startswith(
+            self.excluded_types
+        )
+
+    def flush_chunks(self, contenttype):
+        if self.flush is None:
+            return contenttype.lower().startswith(self.streaming_types)
+
+        return self.flush
+
+
+class CachePolicy:
+    """
+    Caching policy of the responses, the ``Cache-Control`` header is made
+    once and reused on every response.
+
+    :param max_age: Seconds the response is fresh
+    :param s_maxage: Seconds the response is fresh for the shared caches
+    :param public: ``True`` for ``public``, ``False`` for ``private``
+    :param immutable: The response never changes while fresh
+    :param stale_while_revalidate: Seconds a stale response can be used
+                                   while revalidating in background
+    :param stale_if_error: Seconds a stale response can be used on errors
+    :param no_cache: Revalidate before each use
+    :param no_store: Never store the response
+    :param must_revalidate: Never use the stale response
+    :param expires: Also send the ``Expires`` header, from ``max_age``
+
+    >>> CachePolicy(max_age=60, public=True).header
+    'public, max-age=60'
+    """
+
+    __slots__ = ("header", "max_age", "expires", "_expires_cache")
+
+    def __init__(
+        self,
+        max_age=None,
+        s_maxage=None,
+        public=None,
+        immutable=False,
+        stale_while_revalidate=None,
+        stale_if_error=None,
+        no_cache=False,
+        no_store=False,
+        must_revalidate=False,
+        expires=False,
+    ):
+        directives = []
+        if public is not None:
+            directives.append("public" if public else "private")
+        if no_cache:
+            directives.append("no-cache")
+        if no_store:
+            directives.append("no-store")
+        if max_age is not None:
+            directives.append(f"max-age={max_age}")
+        if s_maxage is not None:
+            directives.append(f"s-maxage={s_maxage}")
+        if must_revalidate:
+            directives.append("must-revalidate")
+        if immutable:
+            directives.append("immutable")
+        if stale_while_revalidate is not None:
+            directives.append(
+                f"stale-while-revalidate={stale_while_revalidate}"
+            )
+        if stale_if_error is not None:
+            directives.append(f"stale-if-error={stale_if_error}")
+
+        self.header = ", ".join(directives)
+        self.max_age = max_age
+        self.expires = expires and max_age is not None
+        self._expires_cache = (None, None)
+
+    def apply(self, headers):
+        headers["cache-control"] = self.header
+        if self.expires:
+            # Formatted once per second
+            now = int(time.time())
+            second, value = self._expires_cache
+            if second != now:
+                value = time.strftime(
+                    HTTP_DATETIME_FORMAT, time.gmtime(now + self.max_age)
+                )
+                self._expires_cache = (now, value)
+
+            headers["expires"] = value
+
+
+class CachedResponse:
+    __slots__ = ("status", "headers", "body", "expires")
+
+    def __init__(self, status, headers, body, expires):
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.expires = expires
+
+
+class Computation(threading.Event):
+    """An in-flight computation of a cached response, see ``acquire``"""
+
+    cached = False
+
+
+class ResponseCache:
+    """
+    Cache of the formatted responses of a route, by verb, path, the
+    selected query parameters and request headers.
+
+    Concurrent misses of the same key are computed once, the other
+    requests wait for the result. When the result can not be cached, e.g.
+    an error or a stream, the waiters compute it concurrently.
+
+    :param ttl: Seconds to keep the responses
+    :param maxsize: Maximum count of the cached responses
+    :param query: Names of the query parameters to distinguish responses
+                  with, ``None`` means the whole query string
+    :param vary: Names of the request headers to distinguish responses
+                 with, ``Accept-Encoding`` is added when compressing
+    :param wait_timeout: Seconds to wait for a concurrent computation,
+                         before computing it again
+    """
+
+    def __init__(
+        self,
+        ttl=60,
+        maxsize=1024,
+        query=None,
+        vary=(),
+        wait_timeout=10,
+        clock=time.monotonic,
+    ):
+        self.ttl = ttl
+        self.query = query
+        self.vary = tuple(
+            "HTTP_" + name.upper().replace("-", "_") for name in vary
+        )
+        self.wait_timeout = wait_timeout
+        self.clock = clock
+        self.entries = LRUCache(maxsize)
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    @property
+    def stats(self):
+        return self.entries.stats
+
+    def clear(self):
+        self.entries.clear()
+
+    def key(self, request, response):
+        environ = request.environ
+        if self.query is None:
+            query = environ.get("QUERY_STRING", "")
+        else:
+            values = request.query
+            query = tuple(
+                tuple(value) if isinstance(value, list) else value
+                for value in (values.get(name) for name in self.query)
+            )
+
+        vary = tuple(environ.get(name) for name in self.vary)
+        if response.compression is not None:
+            vary += (response.accept_encoding,)
+
+        return request.verb, request.path, query, vary
+
+    def acquire(self, key):
+        """
+        Return the cached response, or ``None`` along with a token when the
+        caller has to compute it and then call :meth:`release`.
+
+        The token is ``None`` too when the caller has to compute it without
+        caching, as the concurrent computation was not cacheable or did
+        not end in time.
+        """
+        while True:
+            entry = self.entries.get(key)
+            if entry is not None:
+                if entry.expires > self.clock():
+                    return entry, None
+
+                self.entries.pop(key)
+
+            with self._lock:
+                event = self._inflight.get(key)
+                if event is None:
+                    event = self._inflight[key] = Computation()
+                    return None, event
+
+            if not event.wait(self.wait_timeout) or not event.cached:
+                return None, None
+
+    def release(self, key, token, response=None):
+        """Store the response if cacheable and wake up the waiters"""
+        try:
+            if (
+                response is not None
+                and response.status[:3] == "200"
+                and isinstance(response.body, list)
+                and all(isinstance(i, bytes) for i in response.body)
+            ):
+                self.entries.set(
+                    key,
+                    CachedResponse(
+                        response.status,
+                        tuple(response.headers.items()),
+                        b"".join(response.body),
+                        self.clock() + self.ttl,
+                    ),
+                )
+                if token is not None:
+                    token.cached = True
+        finally:
+            if token is not None:
+                with self._lock:
+                    self._inflight.pop(key, None)
+                token.set()
+
+    def serve(self, request, response, compute):
+        """Fill the response from cache, or by calling ``compute``"""
+        key = self.key(request, response)
+        entry, token = self.acquire(key)
+        if entry is not None:
+            response.status = entry.status
+            response.headers.update(entry.headers)
+            response.body = [entry.body]
+            if request.verb in ("get", "head"):
+                response.check_not_modified(request.environ)
+            return
+
+        computed = None
+        try:
+            compute()
+            computed = response
+        finally:
+            self.release(key, token, computed)
 
 
 class Response:
@@ -11,7 +317,12 @@ class Response:
         self.type = None
         self.charset = None
         self.length = None
+        self.compression = None
+        self.accept_encoding = None
+        self.etag = None
+        self.cache_policy = None
         self._firstchunk = None
+        self._compressor = None
 
     @property
     def contenttype(self):
@@ -34,9 +345,24 @@ class Response:
             # Trying to get at least one element from the generator,
             # to force the method call till the second
             # `yield` statement
-            self._firstchunk = next(body)
+            try:
+                self._firstchunk = next(body)
+            except StopIteration:
+                # Nothing yielded, sent as an empty body
+                body = self.body = []
+
+        if isinstance(body, types.GeneratorType):
+            if self.compression is not None:
+                self._compress_stream()
+
             if self.length is not None:
                 self.headers["content-length"] = str(self.length)
+        elif self.length is not None and not isinstance(
+            body, (str, bytes, list, tuple, type(None))
+        ):
+            # File wrappers and other iterables of known length, passed to
+            # the server as is
+            self.headers["content-length"] = str(self.length)
         else:
             if body is None:
                 body = []
@@ -45,11 +371,111 @@ class Response:
                 body = [body]
 
             if self.charset:
-                body = [i.encode(self.charset) for i in body]
+                charset = self.charset
+                body = [
+                    i.encode(charset) if isinstance(i, str) else i
+                    for i in body
+                ]
 
-            self.headers["content-length"] = str(
-                sum(len(i) for i in body)
-                if self.length is None
-                else self.length
-            )
+            if self.compression is not None:
+                body = self._compress(body)
+
+            # 204 and 304 responses have no body nor length, RFC 7230
+            if self.status[:3] not in ("204", "304"):
+                self.headers["content-length"] = str(
+                    sum(len(i) for i in body)
+                    if self.length is None
+                    else self.length
+                )
             self.body = body
+
+    def _negotiate_compression(self):
+        """Return the chosen content coding, if the body is compressible"""
+        headers = self.headers
+        if (
+            self.status[:3] in ("204", "206", "304")
+            or "content-encoding" in headers
+            or "transfer-encoding" in headers
+            or not self.compression.compressible(headers.get("content-type"))
+        ):
+            return None
+
+        add_vary(headers, "accept-encoding")
+        return negotiate_encoding(
+            self.accept_encoding, self.compression.codings
+        )
+
+    def _use_coding(self, coding):
+        headers = self.headers
+        headers["content-encoding"] = coding
+        self.length = None
+
+        # The compressed representation is not byte to byte identical
+        etag = headers.get("etag")
+        if etag and not etag.startswith("W/"):
+            headers["etag"] = f"W/{etag}"
+
+    def _compress(self, body):
+        coding = self._negotiate_compression()
+        if coding is None:
+            return body
+
+        try:
+            data = b"".join(body)
+        except TypeError:  # Not encoded
+            return body
+
+        if len(data) < self.compression.min_size:
+            return body
+
+        self._use_coding(coding)
+        c = compressor(coding, self.compression.level)
+        return [c.compress(data) + c.flush()]
+
+    def _compress_stream(self):
+        coding = self._negotiate_compression()
+        if coding is None:
+            return
+
+        self._use_coding(coding)
+        self._compressor = compressor(coding, self.compression.level)
+        self.headers.pop("content-length", None)
+
+    def set_etag(self, version=None):
+        """
+        Set the ETag header from the given version of the resource (e.g: a
+        database row version), or the hash of the prepared body.
+        """
+        if version is None:
+            digest = hashlib.blake2b(digest_size=16)
+            for chunk in self.body:
+                digest.update(
+                    chunk if isinstance(chunk, bytes) else chunk.encode()
+                )
+            etag = f'"{digest.hexdigest()}"'
+
+        else:
+            etag = str(version)
+            if not etag.startswith(('"', "W/")):
+                etag = f'"{etag}"'
+
+        self.headers["etag"] = etag
+
+    def check_not_modified(self, environ):
+        """Raise ``HTTPNotModified`` when the ETag is in If-None-Match"""
+        if_none_match = environ.get("HTTP_IF_NONE_MATCH")
+        if if_none_match is None:
+            return
+
+        headers = self.headers
+        etag = headers.get("etag")
+        if etag is None or not etag_matches(if_none_match, etag):
+            return
+
+        exc = HTTPNotModified()
+        for name in not_modified_headers:
+            value = headers.get(name)
+            if value is not None:
+                exc.headers[name] = value
+
+        raise exc
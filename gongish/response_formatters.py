@@ -1,17 +1,57 @@
-try:
-    import ujson as jsonlib
+import re
+import types
 
-    def dump_json(v, indent):  # pragma: nocover
-        # ujson 4.x patch
-        # https://github.com/ultrajson/ultrajson/issues/317
-        if indent is None:
-            indent = 0
-        return jsonlib.dumps(v, indent=indent)
+from .helpers.streaming import coalesce
 
-except ImportError:  # pragma: no cover
-    import json as jsonlib
+# Line breaks of the event stream, unlike ``str.splitlines``
+line_breaks = re.compile(r"\r\n|\r|\n")
 
-    dump_json = jsonlib.dumps
+
+class ServerSentEvent:
+    """
+    An event of ``format_sse`` stream, ``data`` is sent as is when it is
+    a string, otherwise JSON encoded.
+    """
+
+    __slots__ = ("data", "event", "id", "retry")
+
+    def __init__(self, data=None, event=None, id=None, retry=None):
+        self.data = data
+        self.event = event
+        self.id = id
+        self.retry = retry
+
+    def encode(self, codec):
+        lines = []
+        if self.event is not None:
+            lines.append(f"event: {self.event}\n")
+
+        if self.id is not None:
+            lines.append(f"id: {self.id}\n")
+
+        if self.retry is not None:
+            lines.append(f"retry: {self.retry}\n")
+
+        data = self.data
+        if not isinstance(data, (str, bytes)):
+            data = codec.dumps(data)
+
+        if isinstance(data, bytes):
+            data = data.decode()
+
+        for line in line_breaks.split(data):
+            lines.append(f"data: {line}\n")
+
+        lines.append("\n")
+        return "".join(lines).encode()
+
+
+def encode_events(items, codec):
+    for item in items:
+        if not isinstance(item, ServerSentEvent):
+            item = ServerSentEvent(item)
+
+        yield item.encode(codec)
 
 
 class ResponseFormattersMixin:
@@ -31,10 +71,48 @@ class ResponseFormattersMixin:
         response.charset = "utf-8"
 
     @staticmethod
-    def format_json(request, response, indent=None):
+    def format_json(request, response, indent=None, stream=False):
         response.type = "application/json"
         response.charset = "utf-8"
-        response.body = dump_json(response.body, indent=indent)
+        if stream or isinstance(response.body, types.GeneratorType):
+            # Encode the items one by one as a JSON array
+            response.body = request.json_codec.dumps_iter(response.body)
+        else:
+            response.body = request.json_codec.dumps(
+                response.body, indent=indent
+            )
+
+    @staticmethod
+    def format_ndjson(request, response, buffer_size=0):
+        """
+        Newline delimited JSON stream of the items, small items after the
+        first could be merged up to ``buffer_size`` bytes.
+        """
+        response.type = "application/x-ndjson"
+        response.charset = "utf-8"
+        response.length = None
+        codec = request.json_codec
+        newline = b"\n" if codec.binary else "\n"
+        response.body = coalesce(
+            (codec.dumps(item) + newline for item in response.body),
+            buffer_size,
+        )
+
+    @staticmethod
+    def format_sse(request, response, buffer_size=0):
+        """
+        Server-Sent Events stream, items are either ``ServerSentEvent`` or
+        the data of the events. Small events after the first could be
+        merged up to ``buffer_size`` bytes, for bulk feeds only.
+        """
+        response.type = "text/event-stream"
+        response.charset = "utf-8"
+        response.length = None
+        response.headers["cache-control"] = "no-cache"
+        response.body = coalesce(
+            encode_events(response.body, request.json_codec),
+            buffer_size,
+        )
 
     @staticmethod
     def format_binary(request, response):
@@ -1,35 +1,50 @@
 import functools
 import inspect
+import itertools
 import sys
 from contextvars import ContextVar
 
 from .exceptions import (
     HTTPBadRequest,
     HTTPInternalServerError,
+    HTTPMethodNotAllowed,
     HTTPNotFound,
     HTTPStatus,
-    HTTPSuccess,
 )
-from .helpers import WordRouter
-from .request import Request
-from .response import Response
+from .helpers import LRUCache, WordRouter
+from .helpers.contentcoding import compress_chunks
+from .helpers.streaming import coalesce
+from .request import BodyLimits, Request
+from .response import Compression, Response, ResponseCache
 from .response_formatters import ResponseFormattersMixin
 from .static import StaticHandlerMixin
 
-http_success = HTTPSuccess().status
-
 
 class RouterMixin(StaticHandlerMixin, ResponseFormattersMixin):
     request_factory = Request
     response_factory = Response
     _route_argument_char = ":"
+    dispatch_cache_size = 0
+    route_converters = None
+    body_limits = BodyLimits()
+    json_codec = None
+    compression = None
+    auto_etag = False
     _request_var = ContextVar("request", default=None)
     _response_var = ContextVar("response", default=None)
 
     def __init__(self):
         self.verbs = set()
         self.paths = set()
-        self.wordrouter = WordRouter()
+        self.wordrouters = dict()
+        self.pathrouter = WordRouter(self.route_converters)
+        self.dispatch_cache = (
+            LRUCache(self.dispatch_cache_size)
+            if self.dispatch_cache_size
+            else None
+        )
+        self.static_caches = {}
+        self.static_manifests = {}
         self._clear_context()
 
     @property
@@ -83,37 +98,71 @@ class RouterMixin(StaticHandlerMixin, ResponseFormattersMixin):
                     f"'format_{key}' or '{key}'"
                 )
 
-    def chunked(self, trailer_field=None, trailer_value=None):
+    def chunked(
+        self,
+        trailer_field=None,
+        trailer_value=None,
+        buffer_size=0,
+    ):
         """
         http://tools.ietf.org/html/rfc2616#section-14.40
         http://tools.ietf.org/html/rfc2616#section-14.41
+
+        Chunks are encoded once and framed with their size in bytes, small
+        ones after the first are merged up to ``buffer_size`` bytes into a
+        single frame.
+
+        The trailer value may be a callable, called once the body is
+        streamed, when omitted the value returned by the generator is used.
         """
         app = self
 
+        def encode(chunks):
+            charset = app.response.charset or "utf-8"
+            for chunk in chunks:
+                if isinstance(chunk, str):
+                    chunk = chunk.encode(charset)
+
+                if chunk:
+                    yield chunk
+
         def decorator(func):
             @functools.wraps(func)
             def wrapper(*args, **kwargs):
-                nonlocal trailer_field, trailer_value, app
                 app.response.headers["transfer-encoding"] = "chunked"
                 if trailer_field:
                     app.response.headers["trailer"] = trailer_field
 
                 result = func(*args, **kwargs)
-                try:
-                    while True:
-                        chunk = next(result)
-                        yield f"{len(chunk)}\r\n{chunk}\r\n"
+                returned = None
 
-                except StopIteration:
-                    yield "0\r\n"
-                    if trailer_field and trailer_value:
-                        yield f"{trailer_field}: {trailer_value}\r\n"
-                    yield "\r\n"
+                def pull():
+                    nonlocal returned
+                    returned = yield from result
+
+                try:
+                    for chunk in coalesce(encode(pull()), buffer_size):
+                        yield b"%x\r\n%s\r\n" % (len(chunk), chunk)
 
                 except Exception as ex:
-                    exstr = str(ex)
-                    yield f"{len(exstr)}\r\n{exstr}"
-                    yield "0\r\n\r\n"
+                    exbytes = str(ex).encode()
+                    yield b"%x\r\n%s\r\n0\r\n\r\n" % (
+                        len(exbytes),
+                        exbytes,
+                    )
+                    return
+
+                value = trailer_value
+                if callable(value):
+                    value = value()
+
+                elif value is None:
+                    value = returned
+
+                if trailer_field and value is not None:
+                    yield f"0\r\n{trailer_field}: {value}\r\n\r\n".encode()
+                else:
+                    yield b"0\r\n\r\n"
 
             return wrapper
 
@@ -124,7 +173,25 @@ class RouterMixin(StaticHandlerMixin, ResponseFormattersMixin):
 
         return decorator
 
-    def route(self, path, formatter=None, verbs=None, **kwargs):
+    def route(
+        self,
+        path,
+        formatter=None,
+        verbs=None,
+        body_limits=None,
+        json_codec=None,
+        compression=None,
+        cache=None,
+        etag=None,
+        cache_control=None,
+        **kwargs,
+    ):
+        if isinstance(compression, int) and not isinstance(compression, bool):
+            compression = Compression(level=compression)
+
+        if isinstance(cache, (int, float)):
+            cache = ResponseCache(ttl=cache)
+
         def decorator(fn):
             for verb in verbs if verbs else (fn.__name__,):
                 verb = verb.lower()
@@ -134,21 +201,133 @@ class RouterMixin(StaticHandlerMixin, ResponseFormattersMixin):
                     formatter or self.__class__.default_formatter, **kwargs
                 )
 
-                # Get parameters
-                fn._gongish_route_params = tuple(
-                    [
-                        (param.name, param.annotation)
-                        for param in inspect.signature(fn).parameters.values()
-                    ]
+                fn._gongish_body_limits = body_limits
+                fn._gongish_json_codec = json_codec
+                fn._gongish_compression = compression
+                fn._gongish_cache = cache
+                fn._gongish_etag = etag
+                fn._gongish_cache_control = cache_control
+
+                # Precompile parameter converters
+                fn._gongish_route_converters = self._route_converters(
+                    path, fn
                 )
 
                 # Distribute
-                self.wordrouter.add(verb + path, fn)
+                if verb not in self.wordrouters:
+                    self.wordrouters[verb] = WordRouter(self.route_converters)
+
+                self.wordrouters[verb].add(path, fn)
+                self.pathrouter.setdefault(path, set()).add(verb)
                 self.paths.add(path)
                 self.verbs.add(verb)
 
+            # Routes changed, forget the resolved ones
+            if self.dispatch_cache is not None:
+                self.dispatch_cache.clear()
+
         return decorator
 
+    def freeze(self, compact=False, max_nodes=1000):
+        """
+        Compile the route tables into generated dispatch functions, call
+        it once all the routes are registered.
+
+        Only ``max_nodes`` nodes of the top levels of each table are
+        compiled, see ``WordRouter.freeze`` for the startup cost.
+
+        With ``compact`` the tables are converted to the memory efficient
+        representation instead.
+        """
+        for router in (*self.wordrouters.values(), self.pathrouter):
+            if compact:
+                router.compact()
+            else:
+                router.freeze(max_nodes)
+
+    def memory_report(self):
+        """
+        Node count and byte size of the route tables, per verb.
+        """
+        report = {
+            verb: router.memory_report()
+            for verb, router in self.wordrouters.items()
+        }
+        report["paths"] = self.pathrouter.memory_report()
+        return report
+
+    def _route_converters(self, path, fn):
+        """
+        Collect the annotated parameters of the handler as
+        ``(index, name, converter)``, except the ones already converted by
+        a typed route segment (e.g: `:id:int`).
+        """
+        achar = self._route_argument_char
+        segments = [
+            word
+            for word in path.split(WordRouter.delimiter)
+            if word[:1] in (achar, WordRouter.wildcard_char)
+        ]
+        typed = {
+            idx
+            for idx, word in enumerate(segments)
+            if word[:1] == achar and achar in word[1:]
+        }
+        params = inspect.signature(fn).parameters.values()
+        return tuple(
+            (idx, param.name, param.annotation)
+            for idx, param in enumerate(params)
+            if param.annotation is not inspect.Parameter.empty
+            and idx not in typed
+        )
+
+    def _handle(self, handler, route_args, request, response):
+        # Reject too large bodies before reading
+        limits = self.body_limits
+        if handler._gongish_body_limits is not None:
+            limits = limits.override(handler._gongish_body_limits)
+
+        limits.check_length(request.contentlength)
+        request.limits = limits
+
+        json_codec = handler._gongish_json_codec or self.json_codec
+        if json_codec is not None:
+            request.json_codec = json_codec
+
+        response.cache_policy = handler._gongish_cache_control
+        response.body = handler(*route_args)
+
+        # The handler may override the policy, or set the header directly
+        policy = response.cache_policy
+        if policy is not None and "cache-control" not in response.headers:
+            policy.apply(response.headers)
+
+        # The handler knows the version, skip formatting when not modified
+        conditional = request.verb in ("get", "head")
+        if response.etag is not None:
+            response.set_etag(response.etag)
+            if conditional:
+                response.check_not_modified(request.environ)
+
+        # Format response
+        handler._gongish_formatter(request, response)
+
+        response.prepare_to_start()
+
+        auto_etag = handler._gongish_etag
+        if auto_etag is None:
+            auto_etag = self.auto_etag
+
+        if (
+            auto_etag
+            and conditional
+            and response.status[:3] == "200"
+            and "etag" not in response.headers
+            and isinstance(response.body, list)
+        ):
+            response.set_etag()
+            response.check_not_modified(request.environ)
+
     def handle_exception(self, exc, start_response):
         if isinstance(exc, HTTPStatus):
             exc_ = exc
@@ -167,24 +346,29 @@ class RouterMixin(StaticHandlerMixin, ResponseFormattersMixin):
 
         start_response(
             exc_.status,
-            list(self.response.headers.items()),
+            self.response.headers.wsgi(),
             exc_info,
         )
 
         return self._process_response()
 
     def _process_streaming_response(self):
-        # encode if required
         resp = self.response
+        chunks = itertools.chain((resp._firstchunk,), resp.body)
+
+        # encode if required
         if resp.charset and not isinstance(resp._firstchunk, bytes):
-            yield resp._firstchunk.encode(resp.charset)
-            for chunk in resp.body:
-                yield chunk.encode(resp.charset)
+            charset = resp.charset
+            chunks = (chunk.encode(charset) for chunk in chunks)
 
-        else:
-            yield resp._firstchunk
-            for chunk in resp.body:
-                yield chunk
+        if resp._compressor is not None:
+            chunks = compress_chunks(
+                chunks,
+                resp._compressor,
+                resp.compression.flush_chunks(resp.headers["content-type"]),
+            )
+
+        yield from chunks
 
         self.on_end_response()  # hook
         self._clear_context()
@@ -203,24 +387,42 @@ class RouterMixin(StaticHandlerMixin, ResponseFormattersMixin):
         Dispatch path and return handler function
         """
 
-        handler, route_args = self.wordrouter.dispatch(verb + path)
+        cache = self.dispatch_cache
+        if cache is not None:
+            cached = cache.get((verb, path))
+            if cached is not None:
+                handler, route_args = cached
+                return handler, list(route_args)
+
+        router = self.wordrouters.get(verb)
+        handler, route_args = router.dispatch(path) if router else (None, [])
         if not handler:
-            raise HTTPNotFound
+            # The merged routes of all verbs tell whether any one matches
+            if not self.pathrouter.dispatch(path)[0]:
+                raise HTTPNotFound
+
+            # Other patterns than the merged one may match, ask each verb
+            exc = HTTPMethodNotAllowed()
+            exc.headers["allow"] = ", ".join(
+                sorted(
+                    other.upper()
+                    for other, router in self.wordrouters.items()
+                    if other != verb and router.dispatch(path)[0]
+                )
+            )
+            raise exc
 
         # Validate parameters
-        for idx, param in enumerate(handler._gongish_route_params):
-            name, annotation = param
-
-            if annotation == inspect._empty:
-                continue
-
-            # Call the annotation
+        for idx, name, converter in handler._gongish_route_converters:
             try:
-                route_args[idx] = annotation(route_args[idx])
+                route_args[idx] = converter(route_args[idx])
 
             except Exception:
                 raise HTTPBadRequest(f"Invalid Parameter `{name}`")
 
+        if cache is not None:
+            cache.set((verb, path), (handler, tuple(route_args)))
+
         return handler, route_args
 
     def __call__(self, environ, start_response):
@@ -233,13 +435,26 @@ class RouterMixin(StaticHandlerMixin, ResponseFormattersMixin):
 
             # Call handler
             handler, route_args = self.dispatch(request.path, request.verb)
-            response.body = handler(*route_args)
-            response.status = http_success
 
-            # Format response
-            handler._gongish_formatter(request, response)
-
-            response.prepare_to_start()
+            compression = handler._gongish_compression
+            if compression is None:
+                compression = self.compression
+
+            if compression:
+                response.compression = compression
+                response.accept_encoding = environ.get("HTTP_ACCEPT_ENCODING")
+
+            response_cache = handler._gongish_cache
+            if response_cache is None:
+                self._handle(handler, route_args, request, response)
+            else:
+                response_cache.serve(
+                    request,
+                    response,
+                    functools.partial(
+                        self._handle, handler, route_args, request, response
+                    ),
+                )
 
         except Exception as exc:
             return self.handle_exception(exc, start_response)
@@ -252,5 +467,5 @@ class RouterMixin(StaticHandlerMixin, ResponseFormattersMixin):
             for line in cookie.split("\r\n"):
                 response.headers.add(*line.split(": ", 1))
 
-        start_response(response.status, list(response.headers.items()))
+        start_response(response.status, response.headers.wsgi())
         return self._process_response()
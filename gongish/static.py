@@ -1,24 +1,310 @@
 import os
+import re
+import secrets
+import threading
 from mimetypes import guess_type
-from os.path import exists, isdir, join, pardir, relpath
-from time import gmtime, strftime
+from os.path import basename, exists, isdir, isfile, join, pardir, relpath
+from time import gmtime, monotonic, strftime
 
 from .constants import HTTP_DATETIME_FORMAT
-from .exceptions import HTTPForbidden, HTTPNotFound
+from .exceptions import (
+    HTTPForbidden,
+    HTTPNotFound,
+    HTTPNotModified,
+    HTTPPartialContent,
+    HTTPRangeNotSatisfiable,
+)
+from .helpers import FileWrapper, LRUCache
+from .helpers.byteranges import MultipartByteranges, parse_range
+from .helpers.conditional import if_range_matches, make_etag, not_modified
+from .helpers.contentcoding import negotiate_encoding
+from .response import CachePolicy
+
+http_partial_content = HTTPPartialContent().status
+
+PRECOMPRESSED_SUFFIXES = {"br": ".br", "gzip": ".gz", "zstd": ".zst"}
+
+
+class StaticFile:
+    """A file to serve, along with its precomputed headers"""
+
+    __slots__ = (
+        "path",
+        "size",
+        "mtime",
+        "mtime_ns",
+        "contenttype",
+        "etag",
+        "last_modified",
+        "validators",
+        "headers",
+    )
+
+    def __init__(
+        self,
+        path,
+        stat,
+        contenttype,
+        etag=None,
+        encoding=None,
+        vary=None,
+        cache_control=None,
+    ):
+        self.path = path
+        self.size = stat.st_size
+        self.mtime = stat.st_mtime
+        self.mtime_ns = stat.st_mtime_ns
+        self.contenttype = contenttype
+        self.etag = make_etag(stat, etag == "weak") if etag else None
+        self.last_modified = strftime(
+            HTTP_DATETIME_FORMAT, gmtime(stat.st_mtime)
+        )
+
+        # Headers of the 304 responses
+        validators = [("last-modified", self.last_modified)]
+        if self.etag:
+            validators.append(("etag", self.etag))
+        if vary:
+            validators.append(("vary", vary))
+        if cache_control:
+            validators.append(("cache-control", cache_control))
+        self.validators = tuple(validators)
+
+        headers = [("accept-ranges", "bytes"), *validators]
+        if encoding:
+            headers.append(("content-encoding", encoding))
+        self.headers = tuple(headers)
+
+
+class CachedFile:
+    __slots__ = ("file", "body", "checked")
+
+    def __init__(self, file, body):
+        self.file = file
+        self.body = body
+        self.checked = monotonic()
+
+
+class StaticManifest:
+    """
+    Index of the files of a directory by their URL path parts, including
+    the directories having the default document and the precompressed
+    siblings of each file.
+
+    ``cache_control`` is a callable returning the ``Cache-Control`` header
+    of the given file path.
+    """
+
+    def __init__(
+        self,
+        directory,
+        default_document=None,
+        etag="strong",
+        precompressed=None,
+        refresh_interval=None,
+        cache_control=None,
+    ):
+        self.directory = directory
+        self.default_document = default_document
+        self.etag = etag
+        self.precompressed = precompressed or ()
+        self.cache_control = cache_control
+        self.refresh_interval = refresh_interval
+        self.files = {}
+        self.scanned = None
+        self._lock = threading.Lock()
+        self.scan()
+
+    def scan(self):
+        directory = self.directory
+        default_document = self.default_document
+        files = {}
+        for root, _, filenames in os.walk(directory):
+            parts = tuple(
+                i for i in relpath(root, directory).split(os.sep) if i != "."
+            )
+            for filename in filenames:
+                record = self._record(join(root, filename))
+                if record is not None:
+                    files[(*parts, filename)] = record
+
+            if default_document and (*parts, default_document) in files:
+                files[parts] = files[(*parts, default_document)]
+
+        self.files = files
+        self.scanned = monotonic()
+
+    def _record(self, physical_path):
+        try:
+            stat = os.stat(physical_path)
+        except OSError:
+            return None
+
+        contenttype = (
+            guess_type(physical_path)[0] or "application/octet-stream"
+        )
+        siblings = []
+        for coding in self.precompressed:
+            sibling_path = physical_path + PRECOMPRESSED_SUFFIXES[coding]
+            try:
+                siblings.append((coding, sibling_path, os.stat(sibling_path)))
+            except OSError:
+                continue
+
+        etag = self.etag
+        vary = "accept-encoding" if siblings else None
+        cache_control = (
+            self.cache_control(physical_path) if self.cache_control else None
+        )
+        variants = tuple(
+            (
+                coding,
+                StaticFile(
+                    p, s, contenttype, etag, coding, vary, cache_control
+                ),
+            )
+            for coding, p, s in siblings
+        )
+        file = StaticFile(
+            physical_path, stat, contenttype, etag, None, vary, cache_control
+        )
+        return file, variants
+
+    def get(self, parts):
+        interval = self.refresh_interval
+        if (
+            interval is not None
+            and monotonic() - self.scanned >= interval
+            and self._lock.acquire(blocking=False)
+        ):
+            # Other threads use the current index meanwhile
+            try:
+                self.scan()
+            finally:
+                self._lock.release()
+
+        return self.files.get(parts)
 
 
 class StaticHandlerMixin:
+    def static_cache_stats(self):
+        """
+        Statistics of the in memory caches of the static files, per path.
+        """
+        return {
+            path: cache.stats for path, cache in self.static_caches.items()
+        }
+
     def add_static(
         self,
         path: str,
         directory: str,
         default_document: str = "index.html",
         chunk_size: int = 0x4000,
+        etag: str = "strong",
+        precompressed: tuple = None,
+        variants_cache_size: int = 0x1000,
+        cache_size: int = 0,
+        cache_bytes: int = 0x1000000,
+        cache_file_size: int = 0x10000,
+        revalidate_interval: float = 1.0,
+        manifest: bool = False,
+        manifest_refresh: float = None,
+        cache_control: CachePolicy = None,
+        fingerprinted: CachePolicy = None,
+        fingerprint_pattern: str = r"[.-][0-9a-fA-F]{8,}\.\w+$",
     ):
-        def get(*remaining_paths):
-            response = self.response
-            # response.charset = "utf-8"
+        """
+        :param etag: ``strong``, ``weak`` or ``None`` to send no ETag
+        :param precompressed: Content codings of the precompressed siblings
+                              to look for, in order of preference, e.g:
+                              ``("br", "gzip")`` for ``app.js.br`` and
+                              ``app.js.gz``
+        :param variants_cache_size: Count of paths to remember their
+                                    precompressed siblings
+        :param cache_size: Count of the files to keep in memory, ``0`` to
+                           disable the cache
+        :param cache_bytes: Total size of the files kept in memory
+        :param cache_file_size: Files larger than this are never cached
+        :param revalidate_interval: Seconds between the checks of the cached
+                                    files for modifications
+        :param manifest: Index the directory once and serve only the
+                         indexed files, without touching the filesystem to
+                         resolve the paths
+        :param manifest_refresh: Seconds between the rescans of the
+                                 directory, ``None`` to never rescan
+        :param cache_control: Caching policy of the files
+        :param fingerprinted: Caching policy of the files having a content
+                              hash in their name (``fingerprint_pattern``),
+                              ``True`` to cache them for a year as immutable
+        """
+        if fingerprinted is True:
+            fingerprinted = CachePolicy(
+                max_age=31536000, public=True, immutable=True
+            )
+
+        fingerprint = re.compile(fingerprint_pattern).search
+
+        def cache_header(physical_path):
+            if fingerprinted is not None and fingerprint(
+                basename(physical_path)
+            ):
+                return fingerprinted.header
+
+            return cache_control.header if cache_control is not None else None
+
+        variants = LRUCache(variants_cache_size) if precompressed else None
+        cache = None
+        if cache_size:
+            cache = LRUCache(cache_size, cache_bytes)
+            self.static_caches[path] = cache
 
+        index = None
+        if manifest:
+            index = StaticManifest(
+                directory,
+                default_document,
+                etag,
+                precompressed,
+                manifest_refresh,
+                cache_header,
+            )
+            self.static_manifests[path] = index
+
+        def revalidate(key, entry):
+            now = monotonic()
+            if now - entry.checked < revalidate_interval:
+                return True
+
+            try:
+                stat = os.stat(entry.file.path)
+            except OSError:
+                stat = None
+
+            if (
+                stat is None
+                or stat.st_mtime_ns != entry.file.mtime_ns
+                or stat.st_size != len(entry.body)
+            ):
+                cache.pop(key)
+                return False
+
+            entry.checked = now
+            return True
+
+        def find_variants(physical_path):
+            available = variants.get(physical_path)
+            if available is None:
+                available = tuple(
+                    (coding, physical_path + PRECOMPRESSED_SUFFIXES[coding])
+                    for coding in precompressed
+                    if isfile(physical_path + PRECOMPRESSED_SUFFIXES[coding])
+                )
+                variants.set(physical_path, available)
+
+            return available
+
+        def resolve(remaining_paths, accept_encoding):
             # Find the physical path of the given path parts
             physical_path = join(directory, *remaining_paths)
 
@@ -32,27 +318,158 @@ class StaticHandlerMixin:
                 if not (default_document and exists(physical_path)):
                     raise HTTPNotFound()
 
-            response.headers["content-type"] = (
+            # Choose the precompressed sibling
+            vary = None
+            encoding = None
+            file_path = physical_path
+            if precompressed:
+                available = find_variants(physical_path)
+                if available:
+                    vary = "accept-encoding"
+                    encoding = negotiate_encoding(
+                        accept_encoding, [coding for coding, _ in available]
+                    )
+                    if encoding:
+                        file_path = dict(available)[encoding]
+
+            try:
+                stat = os.stat(file_path)
+            except OSError:
+                if not encoding:
+                    raise HTTPNotFound
+
+                # The sibling is gone
+                variants.pop(physical_path)
+                encoding = None
+                file_path = physical_path
+                try:
+                    stat = os.stat(file_path)
+                except OSError:
+                    raise HTTPNotFound
+
+            contenttype = (
                 guess_type(physical_path)[0] or "application/octet-stream"
             )
+            return StaticFile(
+                file_path,
+                stat,
+                contenttype,
+                etag,
+                encoding,
+                vary,
+                cache_header(physical_path),
+            )
 
-            try:
-                f = open(physical_path, mode="rb")
-                stat = os.fstat(f.fileno())
-                response.headers["content-length"] = str(stat[6])
-                response.headers["last-modified"] = strftime(
-                    HTTP_DATETIME_FORMAT, gmtime(stat.st_mtime)
+        def lookup(remaining_paths, accept_encoding):
+            if "" in remaining_paths:
+                remaining_paths = tuple(i for i in remaining_paths if i)
+
+            record = index.get(remaining_paths)
+            if record is None:
+                raise HTTPNotFound
+
+            file, available = record
+            if available:
+                encoding = negotiate_encoding(
+                    accept_encoding, [coding for coding, _ in available]
                 )
+                if encoding:
+                    file = dict(available)[encoding]
+
+            return file
+
+        def get(*remaining_paths):
+            response = self.response
+            environ = self.request.environ
+            accept_encoding = environ.get("HTTP_ACCEPT_ENCODING")
+            # response.charset = "utf-8"
+
+            # Serve the hot files from memory, but not the ranges
+            if cache is not None and "HTTP_RANGE" not in environ:
+                key = remaining_paths
+                if precompressed:
+                    key += (accept_encoding,)
+
+                entry = cache.get(key)
+                if entry is not None and revalidate(key, entry):
+                    file = entry.file
+                    if not_modified(environ, file.etag, file.mtime):
+                        exc = HTTPNotModified()
+                        exc.headers.update(file.validators)
+                        raise exc
+
+                    response.headers.update(file.headers)
+                    response.headers["content-type"] = file.contenttype
+                    response.length = len(entry.body)
+                    return [entry.body]
+
+            if index is None:
+                file = resolve(remaining_paths, accept_encoding)
+            else:
+                file = lookup(remaining_paths, accept_encoding)
 
-                with f:
-                    while True:
-                        r = f.read(chunk_size)
-                        if not r:
-                            break
-                        yield r
+            # Answer the conditional requests before opening the file
+            if not_modified(environ, file.etag, file.mtime):
+                exc = HTTPNotModified()
+                exc.headers.update(file.validators)
+                raise exc
 
+            size = file.size
+            ranges = None
+            range_header = environ.get("HTTP_RANGE")
+            if range_header and if_range_matches(
+                environ, file.etag, file.last_modified
+            ):
+                ranges = parse_range(range_header, size)
+                if ranges == []:
+                    exc = HTTPRangeNotSatisfiable()
+                    exc.headers["content-range"] = f"bytes */{size}"
+                    raise exc
+
+            try:
+                f = open(file.path, mode="rb")
             except OSError:
                 raise HTTPNotFound
 
-        self.route(path=path, formatter=lambda x, y: None)(get)
-        self.route(path=f"{path}/*", formatter=lambda x, y: None)(get)
+            contenttype = file.contenttype
+            headers = response.headers
+            headers.update(file.headers)
+            if not ranges:
+                headers["content-type"] = contenttype
+                response.length = size
+
+                if cache is not None and size <= cache_file_size:
+                    with f:
+                        body = f.read()
+
+                    cache.set(key, CachedFile(file, body), len(body))
+                    response.length = len(body)
+                    return [body]
+
+                # Let the server send the file, e.g: using `sendfile`
+                file_wrapper = environ.get("wsgi.file_wrapper", FileWrapper)
+                return file_wrapper(f, chunk_size)
+
+            response.status = http_partial_content
+            if len(ranges) == 1:
+                first, last = ranges[0]
+                f.seek(first)
+                headers["content-type"] = contenttype
+                headers["content-range"] = f"bytes {first}-{last}/{size}"
+                response.length = last - first + 1
+
+                # The server's wrapper would read till the end of file
+                return FileWrapper(f, chunk_size, response.length)
+
+            body = MultipartByteranges(
+                f, ranges, size, contenttype, secrets.token_hex(12), chunk_size
+            )
+            headers["content-type"] = body.contenttype
+            response.length = body.length
+            return body
+
+        # Compressed files are served using `precompressed`
+        for route_path in (path, f"{path}/*"):
+            self.route(
+                path=route_path, formatter=lambda x, y: None, compression=False
+            )(get)
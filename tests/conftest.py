@@ -1,3 +1,5 @@
+import shutil
+
 import pytest
 
 from os.path import join, dirname
@@ -9,3 +11,14 @@ _stuff_dir = join(_this_dir, "stuff")
 @pytest.fixture
 def stuff_dir():
     return _stuff_dir
+
+
+@pytest.fixture
+def stuff_copy(tmp_path_factory):
+    """A copy of the stuff directory, for the tests touching the files"""
+    parent = str(tmp_path_factory.mktemp("copy"))
+    target = join(parent, "stuff")
+    shutil.copytree(_stuff_dir, target)
+    # A sibling to escape to, by the path traversal attempts
+    shutil.copy(__file__, parent)
+    return target
@@ -0,0 +1,156 @@
+import gzip
+import json
+import zlib
+
+from webob import Request
+
+from gongish import Application, Compression
+from gongish.helpers import StdlibJSONCodec
+
+
+def fetch(app, path, accept_encoding="gzip, deflate", **headers):
+    if accept_encoding:
+        headers["accept-encoding"] = accept_encoding
+
+    resp = Request.blank(path, headers=headers).get_response(app)
+    if "content-length" in resp.headers:
+        assert resp.headers["content-length"] == str(len(resp.body))
+
+    return resp
+
+
+def test_compression():
+    class MyApp(Application):
+        compression = Compression(min_size=100)
+        json_codec = StdlibJSONCodec()
+
+    app = MyApp()
+    rows = [dict(id=i, name=f"user{i}") for i in range(100)]
+
+    @app.json("/rows")
+    def get():
+        return rows
+
+    @app.json("/small")
+    def get():
+        return dict(a=1)
+
+    @app.json("/fast", compression=1)
+    def get():
+        return rows
+
+    @app.json("/plain", compression=False)
+    def get():
+        return rows
+
+    @app.binary("/binary")
+    def get():
+        return b"\x00" * 1000
+
+    @app.text("/vary")
+    def get():
+        app.response.headers["vary"] = "cookie"
+        return "a" * 1000
+
+    @app.text("/encoded")
+    def get():
+        app.response.headers["content-encoding"] = "br"
+        return "a" * 1000
+
+    body = json.dumps(rows).encode()
+
+    resp = fetch(app, "/rows")
+    assert resp.headers["content-encoding"] == "gzip"
+    assert resp.headers["vary"] == "accept-encoding"
+    assert gzip.decompress(resp.body) == body
+    assert len(resp.body) < len(body)
+
+    resp = fetch(app, "/rows", "deflate")
+    assert resp.headers["content-encoding"] == "deflate"
+    assert zlib.decompress(resp.body) == body
+
+    # Vary, even when not compressed
+    resp = fetch(app, "/rows", None)
+    assert "content-encoding" not in resp.headers
+    assert resp.headers["vary"] == "accept-encoding"
+    assert resp.body == body
+
+    resp = fetch(app, "/rows", "br, gzip;q=0")
+    assert "content-encoding" not in resp.headers
+    assert resp.body == body
+
+    # Too small
+    resp = fetch(app, "/small")
+    assert "content-encoding" not in resp.headers
+    assert resp.body == b'{"a": 1}'
+
+    # Per route
+    resp = fetch(app, "/fast")
+    assert resp.headers["content-encoding"] == "gzip"
+    fastest = zlib.compressobj(1, zlib.DEFLATED, 31)
+    assert resp.body == fastest.compress(body) + fastest.flush()
+
+    resp = fetch(app, "/plain")
+    assert "content-encoding" not in resp.headers
+    assert "vary" not in resp.headers
+
+    # Already compressed types and bodies
+    resp = fetch(app, "/binary")
+    assert "content-encoding" not in resp.headers
+    assert "vary" not in resp.headers
+
+    resp = fetch(app, "/encoded")
+    assert resp.headers["content-encoding"] == "br"
+    assert resp.body == b"a" * 1000
+
+    resp = fetch(app, "/vary")
+    assert resp.headers["vary"] == "cookie, accept-encoding"
+    assert gzip.decompress(resp.body) == b"a" * 1000
+
+
+def test_compression_streaming(stuff_dir):
+    app = Application()
+    app.compression = Compression(min_size=0)
+    app.json_codec = StdlibJSONCodec()
+    app.add_static("/public", stuff_dir, cache_size=8)
+
+    @app.text("/stream")
+    def get():
+        for i in range(100):
+            yield f"line {i}\n"
+
+    @app.sse("/events")
+    def get():
+        for i in range(3):
+            yield dict(i=i)
+
+    @app.text("/chunked")
+    @app.chunked
+    def get():
+        yield "first"
+
+    text = "".join(f"line {i}\n" for i in range(100)).encode()
+    resp = fetch(app, "/stream")
+    assert resp.headers["content-encoding"] == "gzip"
+    assert "content-length" not in resp.headers
+    assert gzip.decompress(resp.body) == text
+
+    # Event streams are flushed every chunk
+    req = Request.blank("/events", headers={"accept-encoding": "gzip"})
+    chunks = list(app(req.environ, lambda status, headers: None))
+    decompressor = zlib.decompressobj(31)
+    assert decompressor.decompress(chunks[0]) == b'data: {"i": 0}\n\n'
+    assert decompressor.decompress(chunks[1]) == b'data: {"i": 1}\n\n'
+    assert decompressor.decompress(b"".join(chunks[2:])) == (
+        b'data: {"i": 2}\n\n'
+    )
+
+    # Not the chunked responses
+    resp = fetch(app, "/chunked")
+    assert "content-encoding" not in resp.headers
+
+    # Static files, served as is, see `precompressed`
+    for path in ("/public/index.html", "/public/index.html"):
+        resp = fetch(app, path)
+        assert "content-encoding" not in resp.headers
+        assert resp.body == b"<h1>Hi!</h1>"
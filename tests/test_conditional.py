@@ -0,0 +1,114 @@
+import webtest
+
+from gongish import Application, Compression
+
+
+def test_auto_etag():
+    app = Application()
+    formatted = []
+    data = dict(a=1)
+
+    def formatter(request, response):
+        formatted.append(1)
+        Application.format_json(request, response)
+
+    @app.route("/items", formatter=formatter, etag=True)
+    def get():
+        return data
+
+    @app.route("/versioned", formatter=formatter)
+    def get():
+        app.response.etag = 12
+        app.response.headers["cache-control"] = "no-cache"
+        return data
+
+    @app.json("/plain")
+    def get():
+        return data
+
+    @app.json("/cached", etag=True, cache=60)
+    def get():
+        formatted.append(1)
+        return data
+
+    @app.json("/stream", etag=True)
+    def get():
+        yield data
+
+    @app.json("/items", etag=True)
+    def post():
+        return data
+
+    testapp = webtest.TestApp(app)
+
+    resp = testapp.get("/items")
+    etag = resp.headers["etag"]
+    assert len(etag) == 34
+    assert testapp.get("/items").headers["etag"] == etag
+
+    resp = testapp.get("/items", headers={"if-none-match": etag}, status=304)
+    assert resp.body == b""
+    assert resp.headers["etag"] == etag
+    assert "content-type" not in resp.headers
+
+    testapp.get("/items", headers={"if-none-match": '"other"'}, status=200)
+
+    # Changes
+    data["b"] = 2
+    resp = testapp.get("/items", headers={"if-none-match": etag}, status=200)
+    assert resp.headers["etag"] != etag
+
+    # Precomputed versions skip the formatter
+    formatted.clear()
+    resp = testapp.get("/versioned")
+    assert resp.headers["etag"] == '"12"'
+    resp = testapp.get(
+        "/versioned", headers={"if-none-match": '"12"'}, status=304
+    )
+    assert resp.headers["etag"] == '"12"'
+    assert resp.headers["cache-control"] == "no-cache"
+    assert formatted == [1]
+
+    # Along with the response cache
+    formatted.clear()
+    etag = testapp.get("/cached").headers["etag"]
+    testapp.get("/cached", headers={"if-none-match": etag}, status=304)
+    assert formatted == [1]
+
+    # Not enabled, not applicable
+    assert "etag" not in testapp.get("/plain").headers
+    assert "etag" not in testapp.get("/stream").headers
+    assert "etag" not in testapp.post("/items").headers
+
+
+def test_auto_etag_app_wide():
+    class MyApp(Application):
+        auto_etag = True
+        compression = Compression(min_size=0)
+
+    app = MyApp()
+
+    @app.text("/")
+    def get():
+        return "a" * 100
+
+    @app.text("/off", etag=False)
+    def get():
+        return "a" * 100
+
+    testapp = webtest.TestApp(app)
+
+    # Each representation has its own ETag
+    gzipped = testapp.get("/", headers={"accept-encoding": "gzip"})
+    identity = testapp.get("/")
+    assert gzipped.headers["etag"] != identity.headers["etag"]
+    resp = testapp.get(
+        "/",
+        headers={
+            "accept-encoding": "gzip",
+            "if-none-match": gzipped.headers["etag"],
+        },
+        status=304,
+    )
+    assert resp.headers["vary"] == "accept-encoding"
+    assert "etag" not in testapp.get("/off").headers
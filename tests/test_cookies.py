@@ -33,3 +33,23 @@ def test_simple_route():
     assert counter["max-age"] == "1"
 
     app.shutdown()
+
+
+def test_multiple_cookies():
+
+    app = Application()
+
+    @app.text("/cookies")
+    def get():
+        cookies = app.request.cookies
+        cookies["a"] = "1"
+        cookies["b"] = "2"
+        cookies["b"]["path"] = "/b"
+        return "Cookies"
+
+    testapp = webtest.TestApp(app)
+
+    resp = testapp.get("/cookies")
+    assert resp.headers.getall("set-cookie") == ["a=1", "b=2; Path=/b"]
+
+    app.shutdown()
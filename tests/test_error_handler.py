@@ -18,8 +18,9 @@ def test_error_handler():
     resp = testapp.get("/", status=404)
     assert resp.status == "404 Not Found"
 
-    resp = testapp.get("/user/wrongway", status=404)
-    assert resp.status == "404 Not Found"
+    resp = testapp.get("/user/wrongway", status=405)
+    assert resp.status == "405 Method Not Allowed"
+    assert resp.headers["allow"] == "DELETE"
 
     resp = testapp.delete("/user/kebab", status=400)
     assert resp.status == "400 Invalid Parameter `userid`"
@@ -1,9 +1,15 @@
+import io
 from datetime import date, datetime, time
 
 import pytest
 import webtest
 
-from gongish import Application, HTTPBadRequest
+from gongish import (
+    Application,
+    BodyLimits,
+    HTTPBadRequest,
+    HTTPPayloadTooLarge,
+)
 from gongish.request import RequestForm
 
 
@@ -263,3 +269,207 @@ def test_get_boolean():
 
     form = make_form("FalsE", is_json=False)
     assert form.get_boolean("a") is False
+
+
+def make_multipart(*parts, boundary="xYzZy"):
+    body = b""
+    for headers, content in parts:
+        body += f"--{boundary}\r\n{headers}\r\n\r\n".encode() + content
+        body += b"\r\n"
+    return body + f"--{boundary}--\r\n".encode()
+
+
+@pytest.mark.parametrize("chunk_size", (1, 3, 7, 64, 0x10000))
+def test_multipart(chunk_size):
+    body = make_multipart(
+        ('Content-Disposition: form-data; name="title"', "Hé!".encode()),
+        ('Content-Disposition: form-data; name="tag"', b"a"),
+        ('Content-Disposition: form-data; name="tag"', b""),
+        (
+            'Content-Disposition: form-data; name="avatar"; '
+            'filename="my \\"avatar\\".png"\r\n'
+            "Content-Type: image/png",
+            b"\r\n--xYzZ\r\nPNG" * 100,
+        ),
+        ('Content-Disposition: form-data; name="empty"; filename=""', b""),
+        ("Content-Disposition: form-data", b"nameless"),
+    )
+
+    class Form(RequestForm):
+        spool_threshold = 200
+
+    Form.chunk_size = chunk_size
+    form = Form(
+        {
+            "REQUEST_METHOD": "POST",
+            "QUERY_STRING": "tag=q",
+            "CONTENT_TYPE": 'multipart/form-data; boundary="xYzZy"',
+            "wsgi.input": io.BytesIO(body + b"garbage"),
+        },
+        "multipart/form-data",
+        len(body),
+    )
+    assert form["title"] == "Hé!"
+    assert form["tag"] == ["q", "a", ""]
+
+    avatar = form.avatar
+    assert avatar.name == "avatar"
+    assert avatar.filename == 'my "avatar".png'
+    assert avatar.type == "image/png"
+    assert avatar.value == b"\r\n--xYzZ\r\nPNG" * 100
+    assert avatar.file._rolled
+    assert avatar.read(2) == b"\r\n"
+    assert avatar.value == b"\r\n--xYzZ\r\nPNG" * 100
+    assert avatar.tell() == 2
+
+    assert form.empty.filename == ""
+    assert form.empty.value == b""
+    assert not form.empty.file._rolled
+    assert set(form) == {"title", "tag", "avatar", "empty"}
+
+
+def test_multipart_errors():
+    def parse(body, contenttype="multipart/form-data; boundary=xYzZy"):
+        return RequestForm(
+            {
+                "REQUEST_METHOD": "POST",
+                "CONTENT_TYPE": contenttype,
+                "wsgi.input": io.BytesIO(body),
+            },
+            "multipart/form-data",
+            len(body),
+        )
+
+    body = make_multipart(
+        ('Content-Disposition: form-data; name="a"', b"1"),
+    )
+    assert parse(body) == {"a": "1"}
+    assert parse(b"preamble\r\n" + body) == {"a": "1"}
+
+    for invalid in (
+        b"",
+        body[:-8],
+        body.replace(b"\r\n\r\n", b"\r\n"),
+        body.replace(b"xYzZy\r\n", b"xYzZy!!\r\n"),
+    ):
+        with pytest.raises(HTTPBadRequest):
+            parse(invalid)
+
+    with pytest.raises(HTTPBadRequest):
+        parse(body, "multipart/form-data")
+
+
+def test_urlencoded_body():
+    body = b"a=1&b=%D8%B3%D9%84%D8%A7%D9%85&a=2&c="
+    environ = {
+        "REQUEST_METHOD": "POST",
+        "QUERY_STRING": "a=3",
+        "wsgi.input": io.BytesIO(body + b"&d=beyond-the-length"),
+    }
+    form = RequestForm(environ, None, len(body))
+    assert form == {"a": ["1", "2", "3"], "b": "سلام", "c": ""}
+
+    # No content length, no body
+    environ["wsgi.input"] = io.BytesIO(body)
+    form = RequestForm(environ, "application/x-www-form-urlencoded", None)
+    assert form == {"a": "3"}
+
+    # Unless the server terminates the input
+    environ["wsgi.input"] = io.BytesIO(body)
+    environ["wsgi.input_terminated"] = True
+    form = RequestForm(environ, "application/x-www-form-urlencoded", None)
+    assert form["b"] == "سلام"
+
+
+def test_body_limits():
+    class MyApp(Application):
+        body_limits = BodyLimits(body_size=1024, form_fields=3)
+
+    app = MyApp()
+
+    @app.json("/user")
+    def post():
+        return app.request.form
+
+    @app.json("/user/avatar", body_limits=BodyLimits(body_size=4096))
+    def put():
+        return {k: v.filename for k, v in app.request.form.items()}
+
+    @app.json("/user/small", body_limits=BodyLimits(file_size=10))
+    def put():
+        return {k: v.filename for k, v in app.request.form.items()}
+
+    testapp = webtest.TestApp(app)
+
+    resp = testapp.post("/user", params={"a": "1", "b": "2"})
+    assert resp.json == {"a": "1", "b": "2"}
+
+    testapp.post("/user", params={"a": "x" * 1024}, status=413)
+    testapp.post("/user", params="a=1&b=2&c=3&d=4", status=413)
+    testapp.post_json("/user", params={"a": "x" * 1024}, status=413)
+
+    # Declared length rejected before reading anything
+    class Unreadable:
+        def read(self, *args):
+            raise AssertionError("Body must not be read")
+
+    statuses = []
+    app(
+        {
+            "REQUEST_METHOD": "POST",
+            "PATH_INFO": "/user",
+            "CONTENT_LENGTH": "2048",
+            "wsgi.input": Unreadable(),
+        },
+        lambda status, headers, exc_info=None: statuses.append(status),
+    )
+    assert statuses == ["413 Payload Too Large"]
+
+    # Route limits override the app ones
+    upload = [("avatar", "avatar.png", b"x" * 2048)]
+    testapp.put("/user/avatar", upload_files=upload)
+    testapp.put("/user/small", upload_files=upload, status=413)
+    resp = testapp.put(
+        "/user/small", upload_files=[("avatar", "avatar.png", b"x" * 10)]
+    )
+    assert resp.json == {"avatar": "avatar.png"}
+    testapp.put(
+        "/user/avatar",
+        upload_files=[(f"f{i}", "f.png", b"x") for i in range(4)],
+        status=413,
+    )
+
+    # Streaming body without length stops right after the limit
+    body = make_multipart(
+        ('Content-Disposition: form-data; name="a"; filename="a"', b"x" * 100)
+    )
+    fp = io.BytesIO(body)
+    with pytest.raises(HTTPPayloadTooLarge):
+        RequestForm(
+            {
+                "REQUEST_METHOD": "POST",
+                "CONTENT_TYPE": "multipart/form-data; boundary=xYzZy",
+                "wsgi.input": fp,
+                "wsgi.input_terminated": True,
+            },
+            "multipart/form-data",
+            None,
+            BodyLimits(body_size=50),
+        )
+    assert fp.tell() == 51
+
+    fp = io.BytesIO(b"a=" + b"x" * 100)
+    with pytest.raises(HTTPPayloadTooLarge):
+        RequestForm(
+            {
+                "REQUEST_METHOD": "POST",
+                "wsgi.input": fp,
+                "wsgi.input_terminated": True,
+            },
+            None,
+            None,
+            BodyLimits(body_size=50),
+        )
+    assert fp.tell() == 51
+
+    app.shutdown()
@@ -1,3 +1,5 @@
+import pytest
+
 from gongish.helpers import HeaderSet
 
 
@@ -31,3 +33,62 @@ def test_headerset():
         }
     )
     assert headers == {}
+
+
+def test_headerset_multiple_values():
+
+    headers = HeaderSet()
+    headers["Content-Type"] = "text/plain"
+    headers.add("Set-Cookie", "a=1")
+    headers.add("set-cookie: b=2; Path=/")
+    assert headers.wsgi() == [
+        ("content-type", "text/plain"),
+        ("set-cookie", "a=1"),
+        ("set-cookie", "b=2; Path=/"),
+    ]
+    # Servers appending to the WSGI list leave the headers alone
+    headers.wsgi().append(("date", "now"))
+    assert "date" not in headers
+    assert headers["SET-COOKIE"] == "a=1"
+    assert headers.get_all("set-cookie") == ["a=1", "b=2; Path=/"]
+    assert str(headers) == (
+        "content-type: text/plain\r\n"
+        "set-cookie: a=1\r\n"
+        "set-cookie: b=2; Path=/"
+    )
+
+    # Update keeps the repeated names of the other set
+    other = HeaderSet()
+    other.update(headers)
+    assert other == headers
+
+    # Setting replaces all the values
+    headers["set-cookie"] = "c=3"
+    headers["vary"] = "cookie"
+    assert headers.wsgi() == [
+        ("content-type", "text/plain"),
+        ("set-cookie", "c=3"),
+        ("vary", "cookie"),
+    ]
+    assert headers == {
+        "content-type": "text/plain",
+        "set-cookie": "c=3",
+        "vary": "cookie",
+    }
+
+    assert other.pop("set-cookie") == "a=1"
+    assert "set-cookie" not in other
+    assert other.pop("set-cookie", None) is None
+    del other["content-type"]
+    assert len(other) == 0
+    with pytest.raises(KeyError):
+        del other["content-type"]
+
+    with pytest.raises(KeyError):
+        other["content-type"]
+
+    # Common headers reuse the same tuples
+    first, second = HeaderSet(), HeaderSet()
+    first["content-length"] = "12"
+    second["Content-Length"] = "12"
+    assert first.wsgi()[0] is second.wsgi()[0]
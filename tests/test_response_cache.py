@@ -0,0 +1,236 @@
+import threading
+import time
+
+import webtest
+
+from gongish import (
+    Application,
+    CachePolicy,
+    Compression,
+    HTTPNotFound,
+    ResponseCache,
+)
+from gongish.helpers.conditional import parse_http_date
+
+
+def test_response_cache():
+    app = Application()
+    clock = [1000.0]
+    calls = []
+
+    @app.json("/items", cache=ResponseCache(ttl=10, clock=lambda: clock[0]))
+    def get():
+        calls.append(app.request.query.get("page"))
+        return dict(calls=len(calls))
+
+    pages_cache = ResponseCache(query=("page",), vary=("x-lang",), maxsize=2)
+
+    @app.text("/pages", cache=pages_cache)
+    def get():
+        calls.append("pages")
+        return f"{app.request.query.get('page')} {len(calls)}"
+
+    @app.text("/missing", cache=60)
+    def get():
+        calls.append("missing")
+        raise HTTPNotFound()
+
+    @app.text("/stream", cache=60)
+    def get():
+        calls.append("stream")
+        yield "a"
+
+    testapp = webtest.TestApp(app)
+
+    resp = testapp.get("/items")
+    assert resp.json == dict(calls=1)
+    assert testapp.get("/items").json == dict(calls=1)
+    assert testapp.get("/items").headers == resp.headers
+    assert len(calls) == 1
+
+    # Whole query string by default
+    assert testapp.get("/items?page=2").json == dict(calls=2)
+    assert testapp.get("/items?page=2").json == dict(calls=2)
+
+    # Expiration
+    clock[0] += 10
+    assert testapp.get("/items").json == dict(calls=3)
+    assert testapp.get("/items").json == dict(calls=3)
+
+    # Selected query parameters and headers
+    calls.clear()
+    assert testapp.get("/pages?page=1").text == "1 1"
+    assert testapp.get("/pages?page=1&utm=x").text == "1 1"
+    assert testapp.get("/pages?page=2").text == "2 2"
+    assert testapp.get("/pages?page=2", headers={"x-lang": "fa"}).text == (
+        "2 3"
+    )
+    assert pages_cache.stats["evictions"] == 1
+
+    # Not cached: failures and streams
+    calls.clear()
+    testapp.get("/missing", status=404)
+    testapp.get("/missing", status=404)
+    assert testapp.get("/stream").text == "a"
+    assert testapp.get("/stream").text == "a"
+    assert calls == ["missing", "missing", "stream", "stream"]
+
+
+def test_response_cache_compression():
+    app = Application()
+    app.compression = Compression(min_size=0)
+    calls = []
+
+    @app.text("/", cache=60)
+    def get():
+        calls.append(1)
+        return "a" * 100
+
+    testapp = webtest.TestApp(app)
+    for accept_encoding in ("gzip", "identity", "gzip", "identity"):
+        resp = testapp.get("/", headers={"accept-encoding": accept_encoding})
+        assert resp.text == "a" * 100
+
+    assert len(calls) == 2
+
+
+def test_response_cache_stampede():
+    app = Application()
+    calls = []
+    started = threading.Event()
+
+    @app.text("/", cache=60)
+    def get():
+        calls.append(1)
+        started.set()
+        time.sleep(0.1)
+        return "slow"
+
+    testapp = webtest.TestApp(app)
+    results = []
+
+    def request():
+        results.append(testapp.get("/").text)
+
+    first = threading.Thread(target=request)
+    first.start()
+    started.wait()
+    others = [threading.Thread(target=request) for _ in range(5)]
+    for thread in others:
+        thread.start()
+    for thread in (first, *others):
+        thread.join()
+
+    assert results == ["slow"] * 6
+    assert len(calls) == 1
+
+    # A failed computation lets the waiters compute, without caching
+    cache = ResponseCache()
+    key = ("get", "/", "", ())
+    entry, token = cache.acquire(key)
+    assert entry is None and token is not None
+    waiters = []
+    threads = [
+        threading.Thread(target=lambda: waiters.append(cache.acquire(key)))
+        for _ in range(3)
+    ]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.05)
+    cache.release(key, token)
+    for thread in threads:
+        thread.join()
+    assert waiters == [(None, None)] * 3
+
+    # The next ones compute once again
+    entry, token = cache.acquire(key)
+    assert entry is None and token is not None
+    cache.release(key, token)
+
+
+def test_response_cache_uncacheable_concurrency():
+    app = Application()
+    calls = []
+
+    @app.text("/missing", cache=60)
+    def get():
+        calls.append("missing")
+        time.sleep(0.2)
+        raise HTTPNotFound()
+
+    @app.text("/stream", cache=60)
+    def get():
+        calls.append("stream")
+        time.sleep(0.2)
+        yield "a"
+
+    testapp = webtest.TestApp(app)
+
+    for path, status in (("/missing", 404), ("/stream", 200)):
+        threads = [
+            threading.Thread(target=lambda: testapp.get(path, status=status))
+            for _ in range(6)
+        ]
+        started = time.monotonic()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        # The waiters compute together, not one after another
+        assert time.monotonic() - started < 0.2 * 3
+
+    assert calls == ["missing"] * 6 + ["stream"] * 6
+
+
+def test_cache_control():
+    app = Application()
+    policy = CachePolicy(
+        max_age=60,
+        s_maxage=600,
+        public=True,
+        stale_while_revalidate=30,
+        expires=True,
+    )
+
+    @app.json("/items", cache_control=policy)
+    def get():
+        return []
+
+    @app.json("/private", cache_control=policy)
+    def get():
+        app.response.cache_policy = CachePolicy(no_store=True)
+        return []
+
+    @app.json("/direct", cache_control=policy)
+    def get():
+        app.response.headers["cache-control"] = "no-cache"
+        return []
+
+    @app.json("/uncached", cache_control=policy)
+    def get():
+        app.response.cache_policy = None
+        return []
+
+    @app.json("/error", cache_control=policy)
+    def get():
+        raise HTTPNotFound()
+
+    testapp = webtest.TestApp(app)
+    resp = testapp.get("/items")
+    assert resp.headers["cache-control"] == (
+        "public, max-age=60, s-maxage=600, stale-while-revalidate=30"
+    )
+    expires = parse_http_date(resp.headers["expires"])
+    assert 59 <= expires - time.time() <= 61
+
+    resp = testapp.get("/private")
+    assert resp.headers["cache-control"] == "no-store"
+    assert "expires" not in resp.headers
+    assert testapp.get("/direct").headers["cache-control"] == "no-cache"
+    assert "cache-control" not in testapp.get("/uncached").headers
+    assert "cache-control" not in testapp.get("/error", status=404).headers
+
+    assert CachePolicy(
+        public=False, no_cache=True, must_revalidate=True, stale_if_error=9
+    ).header == "private, no-cache, must-revalidate, stale-if-error=9"
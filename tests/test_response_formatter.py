@@ -1,7 +1,16 @@
+import time
+
 import pytest
 import webtest
 
-from gongish import Application
+from gongish import Application, ServerSentEvent
+from gongish.helpers import (
+    OrjsonCodec,
+    StdlibJSONCodec,
+    default_json_codec,
+)
+from gongish.helpers import jsoncodec
+from gongish.helpers.streaming import coalesce
 
 
 def test_default_formatter():
@@ -118,3 +127,250 @@ def test_unknown_formatter():
     )
 
     app.shutdown()
+
+
+def test_json_codecs():
+    class RecordingCodec(StdlibJSONCodec):
+        def __init__(self):
+            self.calls = []
+
+        def dumps(self, value, indent=None):
+            self.calls.append("dumps")
+            return super().dumps(value, indent=indent)
+
+        def loads(self, data):
+            self.calls.append("loads")
+            return super().loads(data)
+
+    app_codec = RecordingCodec()
+    route_codec = RecordingCodec()
+
+    class MyApp(Application):
+        json_codec = app_codec
+
+    app = MyApp()
+
+    @app.json("/")
+    def post():
+        return app.request.form
+
+    @app.json("/route", json_codec=route_codec)
+    def post():
+        return app.request.form
+
+    @app.json("/indent", indent=2)
+    def get():
+        return {"a": 1}
+
+    testapp = webtest.TestApp(app)
+    assert testapp.post_json("/", {"a": 1}).json == {"a": 1}
+    assert app_codec.calls == ["loads", "dumps"]
+
+    assert testapp.post_json("/route", {"a": 2}).json == {"a": 2}
+    assert route_codec.calls == ["loads", "dumps"]
+    assert app_codec.calls == ["loads", "dumps"]
+
+    assert testapp.get("/indent").text == '{\n  "a": 1\n}'
+
+    # orjson is used only when chosen, as its output differs
+    assert not isinstance(default_json_codec(), OrjsonCodec)
+    app = Application()
+
+    @app.json("/")
+    def get():
+        return {"name": "\u00e9"}
+
+    assert webtest.TestApp(app).get("/").body in (
+        b'{"name":"\\u00e9"}',  # ujson
+        b'{"name": "\\u00e9"}',
+    )
+
+
+def test_binary_json_codec():
+    pytest.importorskip("orjson")
+
+    # Binary codecs skip encoding
+    codec = OrjsonCodec()
+    assert codec.binary
+    assert codec.dumps({1: "é"}) == '{"1":"é"}'.encode()
+    assert codec.dumps({"a": 1}, indent=4) == b'{\n  "a": 1\n}'
+    assert codec.loads(b'{"a": 1}') == {"a": 1}
+
+    app = Application()
+    app.json_codec = codec
+
+    @app.json("/")
+    def get():
+        return {"a": "é"}
+
+    resp = webtest.TestApp(app).get("/")
+    assert resp.body == '{"a":"é"}'.encode()
+    assert resp.headers["content-length"] == str(len(resp.body))
+    assert resp.headers["content-type"] == "application/json; charset=utf-8"
+
+
+def test_json_stream():
+    app = Application()
+    app.json_codec = StdlibJSONCodec()
+
+    @app.json("/rows")
+    def get():
+        for i in range(20000):
+            yield {"id": i, "name": f"row {i}"}
+
+    @app.json("/empty")
+    def get():
+        return
+        yield
+
+    @app.json("/list", stream=True)
+    def get():
+        return [1, "two", None]
+
+    @app.json("/bad")
+    def get():
+        raise ValueError
+        yield
+
+    testapp = webtest.TestApp(app)
+    resp = testapp.get("/rows")
+    assert resp.json == [{"id": i, "name": f"row {i}"} for i in range(20000)]
+    assert resp.headers["content-type"] == "application/json; charset=utf-8"
+
+    assert testapp.get("/empty").json == []
+    assert testapp.get("/list").json == [1, "two", None]
+    testapp.get("/bad", status=500)
+
+    # Chunks are bounded, whatever the count of rows
+    chunks = list(StdlibJSONCodec().dumps_iter(range(100000), 1024))
+    assert "".join(chunks) == str(list(range(100000))).replace(" ", "")
+    assert len(chunks) > 100
+    assert max(len(i) for i in chunks) < 1024 + 10
+
+
+def test_binary_json_stream():
+    pytest.importorskip("orjson")
+
+    chunks = list(OrjsonCodec().dumps_iter(iter(["é", {"a": 1}]), 1))
+    assert chunks == [b'["\xc3\xa9"', b',{"a":1}', b"]"]
+    assert list(OrjsonCodec().dumps_iter([])) == [b"[]"]
+
+
+def test_ndjson_and_sse():
+    app = Application()
+    app.json_codec = StdlibJSONCodec()
+
+    @app.ndjson("/feed")
+    def get():
+        yield {"a": 1}
+        yield [1, 2]
+        yield "é"
+
+    @app.ndjson("/coalesced", buffer_size=20)
+    def get():
+        for i in range(10):
+            yield i
+
+    @app.sse("/events")
+    def get():
+        yield {"a": 1}
+        yield "multi\nline"
+        yield ServerSentEvent("hi", event="greet", id=7, retry=1000)
+        yield "a\u2028b\x85c\r\nd\re"
+
+    @app.ndjson("/empty")
+    def get():
+        yield from ()
+
+    @app.sse("/noevents", buffer_size=100)
+    def get():
+        yield from ()
+
+    testapp = webtest.TestApp(app)
+    resp = testapp.get("/feed")
+    assert resp.headers["content-type"] == (
+        "application/x-ndjson; charset=utf-8"
+    )
+    assert resp.text == '{"a": 1}\n[1, 2]\n"\\u00e9"\n'
+
+    resp = testapp.get("/coalesced")
+    assert resp.text == "".join(f"{i}\n" for i in range(10))
+
+    resp = testapp.get("/events")
+    assert resp.headers["content-type"] == "text/event-stream; charset=utf-8"
+    assert resp.headers["cache-control"] == "no-cache"
+    assert resp.text == (
+        'data: {"a": 1}\n\n'
+        "data: multi\ndata: line\n\n"
+        "event: greet\nid: 7\nretry: 1000\ndata: hi\n\n"
+        "data: a\u2028b\x85c\ndata: d\ndata: e\n\n"
+    )
+
+    # Empty streams
+    for path in ("/empty", "/noevents"):
+        resp = testapp.get(path, status=200)
+        assert resp.body == b""
+        assert resp.headers["content-length"] == "0"
+
+    # Coalescing of the chunks
+    chunks = [b"a"] * 10
+    assert list(coalesce(iter(chunks), 4)) == [b"a", b"aaaa", b"aaaa", b"a"]
+    assert list(coalesce(iter(chunks))) == chunks
+    assert list(coalesce([], 4)) == []
+
+
+def test_orjson_codec_missing(monkeypatch):
+    monkeypatch.setattr(jsoncodec, "orjson", None)
+    with pytest.raises(ImportError):
+        OrjsonCodec()
+
+
+def test_sse_binary_json_codec():
+    pytest.importorskip("orjson")
+
+    # JSON data with unicode line separators stays on a single line
+    encoded = ServerSentEvent({"a": "x\u2028y"}).encode(OrjsonCodec())
+    assert encoded == 'data: {"a":"x\u2028y"}\n\n'.encode()
+
+
+def test_streaming_latency():
+    app = Application()
+    app.json_codec = StdlibJSONCodec()
+
+    @app.sse("/ticks")
+    def get():
+        for i in range(3):
+            time.sleep(0.1)
+            yield i
+
+    @app.sse("/buffered", buffer_size=0x4000)
+    def get():
+        yield "hello"
+        time.sleep(0.3)
+        yield "bye"
+
+    @app.text("/chunked")
+    @app.chunked(buffer_size=0x4000)
+    def get():
+        yield "hello"
+        time.sleep(0.3)
+        yield "bye"
+
+    # Each event is sent as soon as it is produced
+    environ = webtest.TestRequest.blank("/ticks").environ
+    started = time.monotonic()
+    for index, chunk in enumerate(app(environ, lambda *args: None)):
+        assert chunk == f"data: {index}\n\n".encode()
+        assert time.monotonic() - started < 0.1 * (index + 1) + 0.08
+
+    # The first chunk is never held, even when buffering
+    for path, first in (
+        ("/buffered", b"data: hello\n\n"),
+        ("/chunked", b"5\r\nhello\r\n"),
+    ):
+        environ = webtest.TestRequest.blank(path).environ
+        started = time.monotonic()
+        body = iter(app(environ, lambda *args: None))
+        assert next(body) == first
+        assert time.monotonic() - started < 0.2
+        assert b"bye" in b"".join(body)
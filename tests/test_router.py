@@ -1,10 +1,11 @@
+import hashlib
 import threading
 import time
 
 import pytest
 import webtest
 
-from gongish import Application
+from gongish import Application, HTTPStatus
 from gongish.request import Request
 
 
@@ -230,6 +231,38 @@ def test_stream():
         yield "first"
         raise Exception("error in streaming")
 
+    @app.route("/chunked_unicode")
+    @app.chunked
+    def get():
+        yield "héllo"
+        yield b""
+        yield b"\x00" * 16
+
+    @app.route("/chunked_buffered")
+    @app.chunked(buffer_size=8)
+    def get():
+        for i in range(10):
+            yield str(i)
+
+    @app.route("/chunked_checksum")
+    @app.chunked("x-checksum")
+    def get():
+        digest = hashlib.md5()
+        for chunk in (b"first", b"second"):
+            digest.update(chunk)
+            yield chunk
+
+        return digest.hexdigest()
+
+    counter = []
+
+    @app.route("/chunked_callable_trailer")
+    @app.chunked("x-count", lambda: len(counter))
+    def get():
+        for i in range(3):
+            counter.append(i)
+            yield "."
+
     resp = testapp.get("/")
     assert resp.text == "FooBar"
     assert resp.headers["content-type"] == "text/plain; charset=utf-8"
@@ -262,7 +295,30 @@ def test_stream():
     resp = testapp.get("/bad_chunked")
     assert resp.headers["transfer-encoding"] == "chunked"
     assert "trailer" not in resp.headers
-    assert resp.text == "5\r\nfirst\r\n18\r\nerror in streaming0\r\n\r\n"
+    assert resp.text == "5\r\nfirst\r\n12\r\nerror in streaming\r\n0\r\n\r\n"
+
+    resp = testapp.get("/chunked_unicode")
+    assert resp.body == (
+        b"6\r\nh\xc3\xa9llo\r\n10\r\n" + b"\x00" * 16 + b"\r\n0\r\n\r\n"
+    )
+
+    resp = testapp.get("/chunked_buffered")
+    # The first chunk is sent as is
+    assert resp.text == (
+        "1\r\n0\r\n8\r\n12345678\r\n1\r\n9\r\n0\r\n\r\n"
+    )
+
+    resp = testapp.get("/chunked_checksum")
+    assert resp.headers["trailer"] == "x-checksum"
+    checksum = hashlib.md5(b"firstsecond").hexdigest()
+    assert resp.text == (
+        f"5\r\nfirst\r\n6\r\nsecond\r\n0\r\nx-checksum: {checksum}\r\n\r\n"
+    )
+
+    resp = testapp.get("/chunked_callable_trailer")
+    assert resp.text == (
+        "1\r\n.\r\n1\r\n.\r\n1\r\n.\r\n0\r\nx-count: 3\r\n\r\n"
+    )
 
 
 def test_multiple_verbs():
@@ -281,7 +337,53 @@ def test_multiple_verbs():
     assert resp.text == "The Root post"
     assert resp.status == "200 OK"
 
-    testapp.put("/", status=404)
+    resp = testapp.put("/", status=405)
+    assert resp.headers["allow"] == "DELETE, GET, POST"
+
+    @app.route("/user/:userid")
+    def get(userid: int):
+        return f"User {userid}"
+
+    @app.route("/user/:id")
+    def patch(id: int):
+        return f"Patch user {id}"
+
+    resp = testapp.get("/user/1")
+    assert resp.text == "User 1"
+
+    resp = testapp.delete("/user/1", status=405)
+    assert resp.headers["allow"] == "GET, PATCH"
+
+    testapp.delete("/user/1/books", status=404)
+
+    # Verbs of all the patterns matching the path
+    @app.route("/a/:x")
+    def get(x):
+        return x
+
+    @app.route("/a/b")
+    def post():
+        return "b"
+
+    assert testapp.get("/a/b").text == "b"
+    resp = testapp.delete("/a/b", status=405)
+    assert resp.headers["allow"] == "GET, POST"
+    resp = testapp.post("/a/c", status=405)
+    assert resp.headers["allow"] == "GET"
+
+    @app.route("/u/:id:int")
+    def put(id):
+        return "put"
+
+    @app.route("/u/:name")
+    def patch(name):
+        return "patch"
+
+    resp = testapp.delete("/u/5", status=405)
+    assert resp.headers["allow"] == "PATCH, PUT"
+    resp = testapp.delete("/u/me", status=405)
+    assert resp.headers["allow"] == "PATCH"
+    testapp.get("/nothing", status=404)
 
 
 def test_racing():
@@ -312,3 +414,135 @@ def test_racing():
     assert lazy_resp["text"] == "Hello lazy bohlul"
 
     app.shutdown()
+
+
+def test_dispatch_cache():
+    class MyApp(Application):
+        dispatch_cache_size = 2
+
+    app = MyApp()
+
+    @app.route("/user/:userid")
+    def get(userid: int):
+        return f"User {userid + 1}"
+
+    @app.route("/user/me")
+    def get():
+        return "Its me"
+
+    testapp = webtest.TestApp(app)
+    cache = app.dispatch_cache
+
+    assert testapp.get("/user/1").text == "User 2"
+    assert testapp.get("/user/1").text == "User 2"
+    assert cache.stats == dict(
+        size=1, bytes=0, hits=1, misses=1, evictions=0
+    )
+
+    # Failures never cached
+    testapp.get("/user/me/books", status=404)
+    testapp.get("/user/foo", status=400)
+    testapp.delete("/user/1", status=405)
+    assert len(cache) == 1
+
+    assert testapp.get("/user/me").text == "Its me"
+    assert testapp.get("/user/2").text == "User 3"
+    assert cache.stats["evictions"] == 1
+    handler, route_args = cache.get(("get", "/user/2"))
+    assert route_args == (2,)
+    assert ("get", "/user/1") not in cache
+
+    # Registering a route invalidates the cache
+    @app.route("/user/:userid")
+    def get(userid: int):
+        return f"New user {userid}"
+
+    assert len(cache) == 0
+    assert testapp.get("/user/2").text == "New user 2"
+
+    # Disabled by default
+    assert Application().dispatch_cache is None
+
+
+def test_typed_route():
+    app = Application()
+
+    @app.route("/items/:id:int")
+    def get(id):
+        return f"Item #{id + 1}"
+
+    @app.route("/items/:name")
+    def get(name: str.upper):
+        return f"Item {name}"
+
+    @app.route("/items/:id:int/price/:price")
+    def put(id: str, price: float):
+        return f"Item #{id + 1} price is {price}"
+
+    testapp = webtest.TestApp(app)
+    assert testapp.get("/items/1").text == "Item #2"
+    assert testapp.get("/items/pen").text == "Item PEN"
+    assert testapp.put("/items/1/price/2.5").text == "Item #2 price is 2.5"
+    resp = testapp.put("/items/1/price/free", status=400)
+    assert resp.status == "400 Invalid Parameter `price`"
+    testapp.put("/items/pen/price/2.5", status=404)
+
+
+@pytest.mark.parametrize("compact", (False, True))
+def test_frozen_router(compact):
+    app = Application()
+    routes = (
+        ("get", "/"),
+        ("get", "/user"),
+        ("get", "/user/me"),
+        ("post", "/user"),
+        ("delete", "/user/:userid"),
+        ("get", "/user/email/:email/book"),
+        ("get", "/user/:userid/book"),
+        ("get", "/user/:userid/book/year/:year"),
+        ("get", "/no_annotation/:name"),
+        ("get", "/wildcard1/*"),
+        ("post", "/wildcard1/*"),
+        ("get", "/wildcard1/wildcardinner/*"),
+        ("get", "/wildcard2/wildcardinner/*"),
+        ("get", "/items/:id:int"),
+        ("get", "/items/:name"),
+    )
+    for verb, path in routes:
+
+        def handler(*args: str):
+            pass
+
+        app.route(path, verbs=(verb,))(handler)
+
+    probes = [
+        (verb, path.replace(":", "").replace("*", "a/b"))
+        for verb, path in routes
+    ] + [
+        ("delete", "/user/13"),
+        ("get", "/user/5/book/year/2001"),
+        ("put", "/user"),
+        ("get", "/user/1"),
+        ("get", "/items/12"),
+        ("get", "/nothing/here"),
+    ]
+
+    def dispatch_all():
+        result = []
+        for verb, path in probes:
+            try:
+                result.append(app.dispatch(path, verb))
+            except HTTPStatus as ex:
+                result.append((ex.status, dict(ex.headers)))
+        return result
+
+    expected = dispatch_all()
+    report = app.memory_report()
+    assert set(report) == {"get", "post", "delete", "paths"}
+    app.freeze(compact=compact)
+    assert dispatch_all() == expected
+    assert app.memory_report()["get"]["nodes"] <= report["get"]["nodes"]
+
+    testapp = webtest.TestApp(app)
+    testapp.get("/user/5/book/year/2001")
+    testapp.put("/user", status=405)
@@ -1,18 +1,25 @@
+import io
 import os
+import threading
 from os.path import join
+from mimetypes import guess_type
+from urllib.request import urlopen
 
 import webtest
+from webob import Request
 
-from gongish import Application
+from gongish import Application, CachePolicy, static
+from gongish.cli.serve import make_server
+from gongish.helpers import FileWrapper
 
 
-def test_static(stuff_dir):
+def test_static(stuff_copy):
     app = Application()
-    app.add_static("/public", stuff_dir)
-    app.add_static("/lost", join(stuff_dir, "lost"))
+    app.add_static("/public", stuff_copy)
+    app.add_static("/lost", join(stuff_copy, "lost"))
 
-    os.utime(join(stuff_dir, "index.html"), (1602179630, 1602179635))
-    os.utime(join(stuff_dir, "img1.png"), (1602179640, 1602179645))
+    os.utime(join(stuff_copy, "index.html"), (1602179630, 1602179635))
+    os.utime(join(stuff_copy, "img1.png"), (1602179640, 1602179645))
 
     @app.route("/")
     def get():
@@ -51,3 +58,476 @@ def test_static(stuff_dir):
     testapp.get("/public/../../setup.py", status=403)
 
     app.shutdown()
+
+
+def test_static_file_wrapper(stuff_dir):
+    app = Application()
+    app.add_static("/public", stuff_dir)
+    wrapped = []
+
+    class CustomFileWrapper(FileWrapper):
+        def __init__(self, filelike, blksize):
+            super().__init__(filelike, blksize)
+            wrapped.append(self)
+
+    testapp = webtest.TestApp(
+        app, extra_environ={"wsgi.file_wrapper": CustomFileWrapper}
+    )
+    resp = testapp.get("/public/img1.png")
+    assert resp.headers["content-length"] == "72332"
+    assert len(resp.body) == 72332
+    assert len(wrapped) == 1
+    assert wrapped[0].filelike.closed
+
+    # Fallback to the builtin wrapper
+    testapp = webtest.TestApp(app)
+    resp = testapp.get("/public/index.html")
+    assert resp.text == "<h1>Hi!</h1>"
+    assert resp.headers["content-length"] == "12"
+
+
+def test_serve_sendfile(stuff_dir):
+    app = Application()
+    app.add_static("/public", stuff_dir)
+
+    httpd = make_server("localhost", 0, app)
+    thread = threading.Thread(target=httpd.handle_request)
+    thread.start()
+    try:
+        url = f"http://localhost:{httpd.server_port}/public/img1.png"
+        with urlopen(url) as resp:
+            body = resp.read()
+            assert resp.headers["content-length"] == "72332"
+    finally:
+        thread.join()
+        httpd.server_close()
+
+    with open(join(stuff_dir, "img1.png"), "rb") as f:
+        assert body == f.read()
+
+
+def test_static_conditional(stuff_copy, monkeypatch):
+    app = Application()
+    app.add_static("/public", stuff_copy)
+    app.add_static("/weak", stuff_copy, etag="weak")
+    app.add_static("/noetag", stuff_copy, etag=None)
+    os.utime(join(stuff_copy, "index.html"), (1602179630, 1602179635))
+    testapp = webtest.TestApp(app)
+
+    resp = testapp.get("/public/index.html")
+    etag = resp.headers["etag"]
+    last_modified = resp.headers["last-modified"]
+    assert etag.startswith('"')
+    assert last_modified == "Thu, 08 Oct 2020 17:53:55 GMT"
+
+    resp = testapp.get("/weak/index.html")
+    assert resp.headers["etag"] == f"W/{etag}"
+
+    resp = testapp.get("/noetag/index.html")
+    assert "etag" not in resp.headers
+
+    # If-None-Match
+    for header in (etag, f"W/{etag}", f'"other", {etag}', "*"):
+        resp = testapp.get(
+            "/public/index.html",
+            headers={"if-none-match": header},
+            status=304,
+        )
+        assert resp.body == b""
+        assert resp.headers["etag"] == etag
+        assert resp.headers["last-modified"] == last_modified
+        assert "content-length" not in resp.headers
+        assert "content-type" not in resp.headers
+
+    resp = testapp.get(
+        "/public/index.html", headers={"if-none-match": '"other"'}
+    )
+    assert resp.text == "<h1>Hi!</h1>"
+
+    # If-None-Match takes precedence over If-Modified-Since
+    testapp.get(
+        "/public/index.html",
+        headers={
+            "if-none-match": '"other"',
+            "if-modified-since": last_modified,
+        },
+        status=200,
+    )
+
+    # If-Modified-Since
+    testapp.get(
+        "/public/index.html",
+        headers={"if-modified-since": last_modified},
+        status=304,
+    )
+    testapp.get(
+        "/noetag/index.html",
+        headers={"if-modified-since": "Fri, 09 Oct 2020 00:00:00 GMT"},
+        status=304,
+    )
+    for header in ("Thu, 08 Oct 2020 17:53:54 GMT", "invalid"):
+        resp = testapp.get(
+            "/public/index.html", headers={"if-modified-since": header}
+        )
+        assert resp.text == "<h1>Hi!</h1>"
+
+    # The file is not opened for the 304 responses
+    opened = []
+    builtin_open = open
+
+    def open_spy(*args, **kwargs):
+        opened.append(args[0])
+        return builtin_open(*args, **kwargs)
+
+    monkeypatch.setattr(static, "open", open_spy, raising=False)
+    testapp.get(
+        "/public/index.html", headers={"if-none-match": etag}, status=304
+    )
+    assert opened == []
+    testapp.get("/public/index.html")
+    assert len(opened) == 1
+
+    testapp.get("/public/nothing.html", status=404)
+
+
+def test_static_ranges(stuff_dir):
+    app = Application()
+    app.add_static("/public", stuff_dir)
+    testapp = webtest.TestApp(app)
+    with open(join(stuff_dir, "img1.png"), "rb") as f:
+        content = f.read()
+
+    size = len(content)
+    url = "/public/img1.png"
+    resp = testapp.get(url)
+    assert resp.headers["accept-ranges"] == "bytes"
+    etag = resp.headers["etag"]
+    last_modified = resp.headers["last-modified"]
+
+    # Single range
+    for header, first, last in (
+        ("bytes=0-99", 0, 99),
+        ("bytes=100-", 100, size - 1),
+        ("bytes=-100", size - 100, size - 1),
+        ("bytes=70000-99999", 70000, size - 1),
+        ("bytes=0-9, 5-19", 0, 19),
+    ):
+        resp = testapp.get(url, headers={"range": header}, status=206)
+        assert resp.body == content[first : last + 1]
+        assert resp.headers["content-range"] == f"bytes {first}-{last}/{size}"
+        assert resp.headers["content-length"] == str(last - first + 1)
+        assert resp.headers["content-type"] == "image/png"
+        assert resp.headers["etag"] == etag
+
+    # Multiple ranges
+    resp = testapp.get(url, headers={"range": "bytes=0-9,-5"}, status=206)
+    contenttype, boundary = resp.headers["content-type"].split("; ")
+    assert contenttype == "multipart/byteranges"
+    boundary = boundary.split("=")[1]
+    assert resp.headers["content-length"] == str(len(resp.body))
+    assert resp.body == b"".join(
+        (
+            f"--{boundary}\r\n".encode(),
+            b"content-type: image/png\r\n",
+            f"content-range: bytes 0-9/{size}\r\n\r\n".encode(),
+            content[:10],
+            f"\r\n--{boundary}\r\n".encode(),
+            b"content-type: image/png\r\n",
+            f"content-range: bytes {size - 5}-{size - 1}/{size}\r\n".encode(),
+            b"\r\n",
+            content[-5:],
+            f"\r\n--{boundary}--\r\n".encode(),
+        )
+    )
+
+    # Unsatisfiable
+    resp = testapp.get(url, headers={"range": f"bytes={size}-"}, status=416)
+    assert resp.headers["content-range"] == f"bytes */{size}"
+
+    # Ignored
+    for header in ("bytes=9-0", "items=0-9", "bytes=a-b", "bytes=--5"):
+        resp = testapp.get(url, headers={"range": header}, status=200)
+        assert resp.body == content
+
+    # If-Range
+    for if_range, status in (
+        (etag, 206),
+        (last_modified, 206),
+        ('"other"', 200),
+        (f"W/{etag}", 200),
+        ("Thu, 01 Jan 2020 00:00:00 GMT", 200),
+    ):
+        headers = {"range": "bytes=0-9", "if-range": if_range}
+        resp = testapp.get(url, headers=headers, status=status)
+        assert len(resp.body) == (10 if status == 206 else size)
+
+
+def test_static_ranges_read(stuff_dir, monkeypatch):
+    app = Application()
+    app.add_static("/public", stuff_dir)
+    read_sizes = []
+
+    class SpyFile(io.FileIO):
+        def read(self, size=-1):
+            data = super().read(size)
+            read_sizes.append(len(data))
+            return data
+
+    monkeypatch.setattr(
+        static,
+        "open",
+        lambda path, mode: SpyFile(path, "r"),
+        raising=False,
+    )
+    testapp = webtest.TestApp(app)
+    testapp.get(
+        "/public/img1.png", headers={"range": "bytes=100-199"}, status=206
+    )
+    assert sum(read_sizes) == 100
+
+    read_sizes.clear()
+    testapp.get(
+        "/public/img1.png",
+        headers={"range": "bytes=100-199,-50"},
+        status=206,
+    )
+    assert sum(read_sizes) == 150
+
+
+def test_static_precompressed(tmp_path):
+    (tmp_path / "app.js").write_bytes(b"var a = 1;")
+    (tmp_path / "app.js.br").write_bytes(b"brotli")
+    (tmp_path / "app.js.gz").write_bytes(b"gzipped")
+    (tmp_path / "style.css").write_bytes(b"a {}")
+    app = Application()
+    app.add_static("/public", str(tmp_path), precompressed=("br", "gzip"))
+    app.add_static("/raw", str(tmp_path))
+
+    def get(path, status=200, **headers):
+        # Bypass webtest, which decodes the responses
+        resp = Request.blank(path, headers=headers).get_response(app)
+        assert resp.status_code == status
+        return resp
+
+    etags = set()
+    for accept_encoding, body, encoding in (
+        ("gzip, deflate, br", b"brotli", "br"),
+        ("gzip, br;q=0.5", b"gzipped", "gzip"),
+        ("x-gzip", b"gzipped", "gzip"),
+        ("*", b"brotli", "br"),
+        ("br;q=0, gzip;q=0", b"var a = 1;", None),
+        ("identity", b"var a = 1;", None),
+        (None, b"var a = 1;", None),
+    ):
+        headers = {}
+        if accept_encoding:
+            headers["accept-encoding"] = accept_encoding
+
+        resp = get("/public/app.js", **headers)
+        assert resp.body == body
+        assert resp.headers["content-type"] == guess_type("app.js")[0]
+        assert resp.headers["vary"] == "accept-encoding"
+        assert resp.headers.get("content-encoding") == encoding
+        etags.add(resp.headers["etag"])
+
+        # Representations have their own ETags
+        headers["if-none-match"] = resp.headers["etag"]
+        resp = get("/public/app.js", status=304, **headers)
+        assert resp.headers["vary"] == "accept-encoding"
+
+    assert len(etags) == 3
+
+    resp = get("/public/style.css", accept_encoding="br")
+    assert resp.body == b"a {}"
+    assert "vary" not in resp.headers
+    assert "content-encoding" not in resp.headers
+
+    resp = get("/raw/app.js", accept_encoding="br")
+    assert resp.body == b"var a = 1;"
+    assert "content-encoding" not in resp.headers
+
+    # The siblings are looked up once per path
+    (tmp_path / "style.css.br").write_bytes(b"new")
+    resp = get("/public/style.css", accept_encoding="br")
+    assert resp.body == b"a {}"
+
+    # Removed siblings
+    (tmp_path / "app.js.br").unlink()
+    resp = get("/public/app.js", accept_encoding="br")
+    assert resp.body == b"var a = 1;"
+    assert "content-encoding" not in resp.headers
+    resp = get("/public/app.js", accept_encoding="gzip")
+    assert resp.body == b"gzipped"
+
+
+def test_static_cache(tmp_path, monkeypatch):
+    (tmp_path / "a.css").write_bytes(b"a" * 10)
+    (tmp_path / "b.css").write_bytes(b"b" * 10)
+    (tmp_path / "c.css").write_bytes(b"c" * 10)
+    (tmp_path / "large.bin").write_bytes(b"l" * 100)
+    clock = [1000.0]
+    monkeypatch.setattr(static, "monotonic", lambda: clock[0])
+
+    app = Application()
+    app.add_static(
+        "/public",
+        str(tmp_path),
+        cache_size=2,
+        cache_bytes=25,
+        cache_file_size=50,
+        revalidate_interval=5,
+    )
+    testapp = webtest.TestApp(app)
+
+    resp = testapp.get("/public/a.css")
+    assert resp.body == b"a" * 10
+    headers = dict(resp.headers)
+
+    # Served from memory, with the same headers
+    monkeypatch.setattr(static, "isdir", None)
+    resp = testapp.get("/public/a.css")
+    assert resp.body == b"a" * 10
+    assert dict(resp.headers) == headers
+    assert app.static_cache_stats()["/public"] == dict(
+        size=1, bytes=10, hits=1, misses=1, evictions=0
+    )
+    testapp.get(
+        "/public/a.css",
+        headers={"if-none-match": headers["etag"]},
+        status=304,
+    )
+    monkeypatch.undo()
+    monkeypatch.setattr(static, "monotonic", lambda: clock[0])
+
+    # Ranges are not served from memory, nor counted
+    stats = app.static_cache_stats()["/public"]
+    resp = testapp.get(
+        "/public/a.css", headers={"range": "bytes=0-1"}, status=206
+    )
+    assert resp.body == b"aa"
+    assert app.static_cache_stats()["/public"] == stats
+
+    # Not cached: too large
+    testapp.get("/public/large.bin")
+    assert app.static_caches["/public"].stats["size"] == 1
+
+    # Bounded by the total bytes then by the count
+    testapp.get("/public/b.css")
+    testapp.get("/public/c.css")
+    stats = app.static_cache_stats()["/public"]
+    assert stats["size"] == 2
+    assert stats["bytes"] == 20
+    assert stats["evictions"] == 1
+
+    # Modifications are noticed after the revalidate interval
+    (tmp_path / "c.css").write_bytes(b"C" * 12)
+    assert testapp.get("/public/c.css").body == b"c" * 10
+    clock[0] += 5
+    assert testapp.get("/public/c.css").body == b"C" * 12
+    assert testapp.get("/public/c.css").body == b"C" * 12
+
+    (tmp_path / "c.css").unlink()
+    clock[0] += 5
+    testapp.get("/public/c.css", status=404)
+
+
+def test_static_manifest(tmp_path, stuff_copy, monkeypatch):
+    app = Application()
+    app.add_static("/public", stuff_copy, manifest=True)
+    testapp = webtest.TestApp(app)
+
+    # Same responses as the default mode
+    os.utime(join(stuff_copy, "index.html"), (1602179630, 1602179635))
+    app.static_manifests["/public"].scan()
+    resp = testapp.get("/public")
+    assert resp.text == "<h1>Hi!</h1>"
+    assert resp.headers["content-type"] == "text/html"
+    assert resp.headers["last-modified"] == "Thu, 08 Oct 2020 17:53:55 GMT"
+    etag = resp.headers["etag"]
+    assert testapp.get("/public/").text == "<h1>Hi!</h1>"
+    assert testapp.get("/public/index.html").headers["etag"] == etag
+    testapp.get("/public/", headers={"if-none-match": etag}, status=304)
+
+    resp = testapp.get("/public/static-subdir/fake-index.html")
+    assert resp.text == "<h1>Hello from subdir!</h1>"
+
+    resp = testapp.get("/public/img1.png", headers={"range": "bytes=0-3"})
+    assert resp.status_code == 206
+    assert resp.body == b"\x89PNG"
+
+    # Misses never touch the filesystem
+    def fail(*args, **kwargs):
+        raise AssertionError("Filesystem accessed")
+
+    class NoStatOS:
+        stat = fail
+
+        def __getattr__(self, name):
+            return getattr(os, name)
+
+    monkeypatch.setattr(static, "os", NoStatOS())
+    monkeypatch.setattr(static, "isdir", fail)
+    monkeypatch.setattr(static, "open", fail, raising=False)
+    testapp.get("/public/img1.jpg", status=404)
+    testapp.get("/public/static-subdir", status=404)
+    testapp.get("/public/../conftest.py", status=404)
+    monkeypatch.undo()
+
+    # Refresh
+    clock = [1000.0]
+    monkeypatch.setattr(static, "monotonic", lambda: clock[0])
+    (tmp_path / "app.js").write_bytes(b"var a;")
+    (tmp_path / "app.js.gz").write_bytes(b"gzipped")
+    app.add_static(
+        "/assets",
+        str(tmp_path),
+        manifest=True,
+        manifest_refresh=10,
+        precompressed=("br", "gzip"),
+    )
+    resp = testapp.get("/assets/app.js")
+    assert resp.body == b"var a;"
+    assert resp.headers["vary"] == "accept-encoding"
+
+    resp = Request.blank(
+        "/assets/app.js", headers={"accept-encoding": "gzip, br"}
+    ).get_response(app)
+    assert resp.body == b"gzipped"
+    assert resp.headers["content-encoding"] == "gzip"
+
+    (tmp_path / "new.js").write_bytes(b"var b;")
+    testapp.get("/assets/new.js", status=404)
+    clock[0] += 10
+    assert testapp.get("/assets/new.js").body == b"var b;"
+
+
+def test_static_cache_control(tmp_path):
+    (tmp_path / "app.3f2a9c1b.js").write_bytes(b"var a;")
+    (tmp_path / "index.html").write_bytes(b"<h1>Hi!</h1>")
+    for manifest in (False, True):
+        app = Application()
+        app.add_static(
+            "/public",
+            str(tmp_path),
+            cache_control=CachePolicy(no_cache=True),
+            fingerprinted=True,
+            manifest=manifest,
+            cache_size=8,
+        )
+        testapp = webtest.TestApp(app)
+
+        for _ in range(2):
+            resp = testapp.get("/public/app.3f2a9c1b.js")
+            assert resp.headers["cache-control"] == (
+                "public, max-age=31536000, immutable"
+            )
+
+            resp = testapp.get("/public/")
+            assert resp.headers["cache-control"] == "no-cache"
+
+        resp = testapp.get(
+            "/public/",
+            headers={"if-none-match": resp.headers["etag"]},
+            status=304,
+        )
+        assert resp.headers["cache-control"] == "no-cache"
@@ -1,6 +1,25 @@
+import random
+
+import pytest
+
 from gongish.helpers import WordRouter
 
 
+def assert_frozen_equal(wt, routes, compact=False, max_nodes=None):
+    """Dispatch the routes before and after freeze and compare"""
+    expected = [wt.dispatch(route) for route in routes]
+    if compact:
+        wt.compact()
+    else:
+        wt.freeze(max_nodes)
+    assert wt.frozen
+    for route, (fn, args) in zip(routes, expected):
+        frozen_fn, frozen_args = wt.dispatch(route)
+        assert frozen_fn is fn, route
+        if fn:
+            assert frozen_args == args, route
+
+
 def test_wordrouter():
     wt = WordRouter()
     wt.add("get/user", lambda: "all users")
@@ -50,3 +69,219 @@ def test_wordrouter2():
     assert wt("get/user/me") == "get my profile"
     assert wt("get/user/12/book") == "get user 12 books"
     assert wt("get/user/me/book") == "get user me books"
+
+
+def test_wordrouter_statics():
+    wt = WordRouter()
+    wt.add("get/user", lambda: "all users")
+    wt.add("get/user/:", lambda x: f"the user no {x}")
+    wt.add("get/user/me", lambda: "my profile")
+    wt.add("get/wildcard/*", lambda *x: f"wildcard {','.join(x)}")
+    assert set(wt.statics) == {"get/user", "get/user/me"}
+
+    # Static routes must resolve the same with or without the index
+    for route in ("get/user", "get/user/me"):
+        fn, args = wt.dispatch(route)
+        statics, wt.statics = wt.statics, {}
+        assert wt.dispatch(route) == (fn, args)
+        wt.statics = statics
+
+    assert wt("get/user/me") == "my profile"
+    assert wt("get/user/12") == "the user no 12"
+    assert wt("get/wildcard/me") == "wildcard me"
+
+
+def test_wordrouter_typed():
+    wt = WordRouter()
+    wt.add("/items/:id:int", lambda x: f"item #{x + 1}")
+    wt.add("/items/:price:float/cheaper", lambda x: f"cheaper than {x}")
+    wt.add("/items/:name", lambda x: f"item {x}")
+    wt.add("/items/:id:int/tags", lambda x: f"tags of #{x}")
+    assert wt.statics == {}
+
+    assert wt("/items/12") == "item #13"
+    assert wt("/items/pen") == "item pen"
+    assert wt("/items/1.5/cheaper") == "cheaper than 1.5"
+    assert wt("/items/3/tags") == "tags of #3"
+    assert wt("/items/pen/tags") is None
+    assert wt("/items/pen/cheaper") is None
+
+    fn, args = wt.dispatch("/items/7")
+    assert args == [7]
+
+    wt = WordRouter(converters={"upper": str.upper})
+    wt.add("/users/:name:upper", lambda x: x)
+    assert wt("/users/john") == "JOHN"
+
+    with pytest.raises(ValueError):
+        wt.add("/users/:id:unknown", lambda x: x)
+
+
+@pytest.mark.parametrize("mode", ("trie", "frozen", "partial", "compact"))
+def test_wordrouter_backtracking(mode):
+    def make(*routes):
+        wt = WordRouter()
+        for route in routes:
+            wt.add(route, lambda *a, r=route: (r, a))
+        if mode == "frozen":
+            wt.freeze(None)
+        elif mode == "partial":
+            wt.freeze(1)
+        elif mode == "compact":
+            wt.compact()
+        return wt
+
+    wt = make(
+        "/items/:id:int",
+        "/items/:price:float/cheaper",
+        "/items/:name",
+        "/items/:name/photos",
+    )
+    assert wt("/items/1.5") == ("/items/:name", ("1.5",))
+    assert wt("/items/3") == ("/items/:id:int", (3,))
+    assert wt("/items/3/cheaper") == ("/items/:price:float/cheaper", (3.0,))
+    assert wt("/items/3/photos") == ("/items/:name/photos", ("3",))
+    assert wt("/items/3/other") is None
+
+    # `str` accepts everything, it is tried last whatever the order
+    wt = make("/u/:x:str", "/u/:id:int")
+    assert wt("/u/5") == ("/u/:id:int", (5,))
+    assert wt("/u/me") == ("/u/:x:str", ("me",))
+
+    # Literals, then the argument, then the wildcard
+    wt = make("/a/b/c", "/a/:x/d", "/a/*")
+    assert wt("/a/b/c") == ("/a/b/c", ())
+    assert wt("/a/b/d") == ("/a/:x/d", ("b",))
+    assert wt("/a/b/e") == ("/a/*", ("b", "e"))
+
+
+def test_frozen_wordrouter():
+    routes = (
+        "get/user",
+        "get/user/me",
+        "get/user/:",
+        "delete/user/:",
+        "post/user",
+        "get/user/email/:email/book",
+        "get/user/:userid/book",
+        "get/user/:userid/book/year/:year",
+        "get/wildcard/*",
+        "get/wildcard/inner/*",
+        "get/wildcard/deep/*/*",
+        "/items/:id:int",
+        "/items/:price:float/cheaper",
+        "/items/:name",
+        "/items/:id:int/tags",
+        "/",
+    )
+    probes = (
+        "get/user",
+        "get/user/me",
+        "get/user/3121",
+        "delete/user/1313",
+        "post/user",
+        "get/user/email/x@site.com/book",
+        "get/user/12/book",
+        "get/user/me/book",
+        "get/user/1/book/year/2020",
+        "get/wildcard/a",
+        "get/wildcard/a/b",
+        "get/wildcard/inner/a",
+        "get/wildcard/inner/a/b",
+        "get/wildcard/deep",
+        "get/wildcard/deep/a",
+        "get/wildcard/deep/a/b/c",
+        "get/users",
+        "get/user/email/x@site.com",
+        "get/user/1/2/3",
+        "get",
+        "/items/12",
+        "/items/pen",
+        "/items/1.5/cheaper",
+        "/items/3/tags",
+        "/items/pen/tags",
+        "/items/pen/cheaper",
+        "/",
+        "",
+        "//",
+    )
+    # Partially compiled, the deeper nodes are walked
+    for max_nodes in (0, 1, 3, 8):
+        wt = WordRouter()
+        for route in routes:
+            wt.add(route, lambda *a, r=route: r)
+        assert_frozen_equal(wt, probes, max_nodes=max_nodes)
+
+    wt = WordRouter()
+    for route in routes:
+        wt.add(route, lambda *a, r=route: r)
+    assert_frozen_equal(wt, probes)
+
+    # Adding a route brings back the trie walker
+    wt.add("get/another", lambda: "another")
+    assert not wt.frozen
+    assert wt("get/another") == "another"
+
+
+def test_frozen_wordrouter_random():
+    rnd = random.Random(1)
+    words = ("a", "b", "c", ":x", ":n:int", "*")
+    for _ in range(50):
+        wt = WordRouter()
+        for _ in range(rnd.randint(1, 30)):
+            route = "/".join(
+                rnd.choice(words) for _ in range(rnd.randint(1, 5))
+            )
+            wt.add(route, lambda *a, r=route: r)
+
+        probes = [
+            "/".join(
+                rnd.choice(("a", "b", "c", "d", "1", "")) for _ in range(n)
+            )
+            for n in range(1, 7)
+            for _ in range(20)
+        ]
+        assert_frozen_equal(
+            wt,
+            probes,
+            compact=rnd.random() > 0.5,
+            max_nodes=rnd.choice((None, 0, 2, 1000)),
+        )
+
+
+def test_compact_wordrouter():
+    wt = WordRouter()
+    wt.add("get/api/v1/user", lambda: "all users")
+    wt.add("get/api/v1/user/:", lambda x: f"user {x}")
+    wt.add("get/api/v1/user/:id:int/books", lambda x: f"books {x}")
+    wt.add("get/api/v1/user/:/photos", lambda x: f"photos {x}")
+    wt.add("get/api/v2/static/files/*", lambda *x: "/".join(x))
+
+    before = wt.memory_report()
+    assert_frozen_equal(
+        wt,
+        (
+            "get/api/v1/user",
+            "get/api/v1/user/me",
+            "get/api/v1/user/12/books",
+            "get/api/v1/user/me/books",
+            "get/api/v1/user/me/photos",
+            "get/api/v2/static/files/a/b",
+            "get/api/v2/static",
+            "get/api",
+        ),
+        compact=True,
+    )
+    assert wt.compacted
+    assert wt.routes.prefix == ("get", "api")
+    assert wt.routes.literals["v2"].prefix == ("static", "files")
+
+    after = wt.memory_report()
+    assert after["nodes"] < before["nodes"]
+    assert after["bytes"] < before["bytes"]
+
+    with pytest.raises(RuntimeError):
+        wt.add("get/another", lambda: None)
+
+    with pytest.raises(RuntimeError):
+        wt.freeze()